@@ -0,0 +1,221 @@
+"""Cálculos reutilizables para los gráficos del dashboard.
+
+Las funciones trabajan sobre arreglos y máscaras de filas de ``ChartData`` y
+evitan recorrer fechas o artistas con bucles de Python.
+"""
+import numpy as np
+import pandas as pd
+
+
+def best_position_pivot(dates, keys, positions, selected_keys, timeline):
+    """Mejor posición diaria de cada clave seleccionada (fechas x claves).
+
+    ``dates``, ``keys`` y ``positions`` describen una fila por aparición. El
+    resultado tiene una fila por fecha de ``timeline`` y una columna por clave
+    de ``selected_keys`` (en ese orden), con NaN los días fuera del chart.
+    """
+    keep = np.isin(keys, selected_keys)
+    appearances = pd.DataFrame({
+        'date': dates[keep],
+        'key': keys[keep],
+        'position': positions[keep],
+    })
+    pivot = appearances.groupby(['date', 'key'])['position'].min().unstack('key')
+    return pivot.reindex(index=pd.Index(timeline, name='date'), columns=selected_keys)
+
+
+def member_position_pivot(data, bridge, rows, member_ids):
+    """Mejor posición diaria de artistas o labels a partir de su puente.
+
+    Las fechas del resultado son las de las filas seleccionadas (``RowRanges``),
+    ordenadas.
+    """
+    links = rows.map(bridge.row_ids)
+    row_ids = links.take(bridge.row_ids)
+    date_values = data.df['date'].to_numpy()
+    timeline = np.unique(rows.take(date_values))
+    return best_position_pivot(
+        date_values[row_ids],
+        links.take(bridge.ids),
+        data.df['Position'].to_numpy()[row_ids],
+        list(member_ids),
+        timeline,
+    )
+
+
+def pivot_to_long(pivot, date_column, key_column, value_column, key_names=None):
+    """Pasar un pivote fechas x claves a formato largo (una fila por fecha y clave).
+
+    Conserva el orden fecha por fecha y las claves en el orden de las columnas;
+    los días sin valor quedan como None.
+    """
+    n_dates, n_keys = pivot.shape
+    keys = np.asarray(pivot.columns if key_names is None else key_names, dtype=object)
+    values = pivot.to_numpy(dtype=object).ravel().copy()
+    values[pd.isna(values)] = None
+    return pd.DataFrame({
+        date_column: np.repeat(pivot.index.to_numpy(), n_keys),
+        key_column: np.tile(keys, n_dates),
+        value_column: values,
+    })
+
+
+# Puntos máximos por gráfico de evolución: con rangos largos se agrupa por semana
+# o mes, y si aun así no entra (resolución forzada) se recorta con LTTB
+MAX_PLOT_POINTS = 2000
+
+# Agrupaciones de un pivote por fecha, de la más fina a la más gruesa
+FREQUENCIES = {
+    'day': None,
+    'week': dict(rule='W-MON', label='left', closed='left'),
+    'month': dict(rule='MS'),
+}
+
+
+def resample_pivot(pivot, frequency):
+    """Mejor posición por semana o mes de un pivote fechas x claves"""
+    options = FREQUENCIES[frequency]
+    if options is None:
+        return pivot
+    return pivot.resample(**options).min()
+
+
+def adaptive_pivot(pivot, max_points, frequency=None):
+    """Agrupar el pivote con la resolución más fina que entra en ``max_points``.
+
+    Con ``frequency`` se usa esa resolución. Devuelve (resolución, pivote).
+    """
+    if frequency is not None:
+        return frequency, resample_pivot(pivot, frequency)
+    for frequency in FREQUENCIES:
+        resampled = resample_pivot(pivot, frequency)
+        if resampled.size <= max_points:
+            break
+    return frequency, resampled
+
+
+def lttb_indices(x, y, n_out):
+    """Índices de los puntos que conserva Largest-Triangle-Three-Buckets.
+
+    Mantiene el primer y el último punto y, en cada balde intermedio, el que
+    forma el triángulo de mayor área con el punto elegido antes y el promedio
+    del balde siguiente, así que los picos y caídas sobreviven al recorte.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_x = x[stop:edges[bucket + 2]].mean()
+            next_y = y[stop:edges[bucket + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        areas = np.abs((x[previous] - next_x) * (y[start:stop] - y[previous])
+                       - (x[previous] - x[start:stop]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def _series_points(x, values, valid_days, missing_days, n_out):
+    """``n_out`` días con valor (LTTB) y un día vacío entre dos elegidos si hubo una ausencia"""
+    if n_out >= 3 or n_out == len(valid_days):
+        kept = valid_days[lttb_indices(x[valid_days], values[valid_days], n_out)]
+    else:
+        kept = valid_days[np.unique(np.linspace(0, len(valid_days) - 1, n_out).round().astype(np.int64))]
+    # Primer día vacío después de cada punto elegido, si cae antes del siguiente
+    following = np.searchsorted(missing_days, kept[:-1], side='right')
+    has_missing = following < len(missing_days)
+    gaps = missing_days[following[has_missing]]
+    gaps = gaps[gaps < kept[1:][has_missing]]
+    return np.union1d(kept, gaps)
+
+
+def _thin_series(x, values, budget):
+    """Días que se dibujan de una serie: a lo sumo ``budget`` contando los vacíos (mínimo uno).
+
+    Si con todos los días posibles no entra, se prueban menos días con valor en
+    proporción al exceso; como cada día elegido necesita a lo sumo un vacío
+    después, con ``budget - ausencias`` o la mitad de ``budget`` siempre entra.
+    """
+    valid = ~np.isnan(values)
+    valid_days = np.flatnonzero(valid)
+    missing_days = np.flatnonzero(~valid)
+    if len(valid_days) == 0:
+        return valid_days
+    budget = max(budget, 1)
+    absences = np.count_nonzero(np.diff(valid_days) > 1)
+    safe = min(max(budget - absences, (budget + 1) // 2), len(valid_days))
+    n_out = min(budget, len(valid_days))
+    for _ in range(2):
+        points = _series_points(x, values, valid_days, missing_days, n_out)
+        if len(points) <= budget:
+            return points
+        n_out = n_out * budget // len(points)
+        if n_out <= safe:
+            break
+    return _series_points(x, values, valid_days, missing_days, safe)
+
+
+def capped_long(pivot, date_column, key_column, value_column, key_names=None, max_points=None):
+    """Como ``pivot_to_long``, pero con a lo sumo ``max_points`` puntos.
+
+    Si el pivote no entra, el total se reparte entre las series y cada una se
+    recorta con LTTB sobre sus días con valor, con un punto vacío donde la
+    clave salió del chart para que la línea se siga cortando ahí. Los puntos
+    vacíos cuentan dentro del límite (cada serie conserva al menos un punto).
+    """
+    if max_points is None or pivot.size <= max_points:
+        return pivot_to_long(pivot, date_column, key_column, value_column, key_names)
+
+    keys = pivot.columns if key_names is None else key_names
+    dates = pivot.index.to_numpy()
+    x = dates.astype('datetime64[s]').astype(np.float64)
+    n_series = max(pivot.shape[1], 1)
+    frames = []
+    for position, (key, values) in enumerate(zip(keys, pivot.to_numpy(dtype=np.float64).T)):
+        budget = max_points // n_series + (position < max_points % n_series)
+        points = _thin_series(x, values, budget)
+        series_values = values[points].astype(object)
+        series_values[np.isnan(values[points])] = None
+        frames.append(pd.DataFrame({
+            date_column: dates[points],
+            key_column: key,
+            value_column: series_values,
+        }))
+    return pd.concat(frames, ignore_index=True).sort_values(date_column, kind='stable', ignore_index=True)
+
+
+def track_presence(datasets, track_ids):
+    """Dónde estuvo cada canción en el chart y con cuánto retraso entre países.
+
+    ``datasets`` mapea país -> ``ChartData`` construidos con las mismas
+    dimensiones, así que los ids de canción son comparables. Devuelve una fila
+    por (canción, país) con primera y última fecha, días en el chart, mejor
+    posición y días de retraso respecto del primer país donde entró.
+    """
+    frames = []
+    for country_code, data in datasets.items():
+        rows = np.flatnonzero(np.isin(data.track_ids, track_ids))
+        frames.append(pd.DataFrame({
+            'track_id': data.track_ids[rows],
+            'country': country_code,
+            'date': data.df['date'].to_numpy()[rows],
+            'Position': data.df['Position'].to_numpy()[rows],
+        }))
+    appearances = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+        columns=['track_id', 'country', 'date', 'Position'])
+    presence = appearances.groupby(['track_id', 'country'], sort=False).agg(
+        first_date=('date', 'min'),
+        last_date=('date', 'max'),
+        days=('date', 'size'),
+        best_position=('Position', 'min'),
+    ).reset_index()
+    first_market = presence.groupby('track_id')['first_date'].transform('min')
+    presence['lag_days'] = (presence['first_date'] - first_market).dt.days
+    return presence.sort_values(['track_id', 'first_date', 'country'], ignore_index=True)
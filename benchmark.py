@@ -0,0 +1,322 @@
+"""Benchmarks del procesamiento del dashboard con charts sintéticos.
+
+Genera CSV ``regional-<pais>-daily-<fecha>.csv`` con el formato del botón de
+descarga (colaboraciones separadas por ", " y labels por " / ") y mide, fuera
+de Streamlit, el tiempo y la memoria pico de cada etapa: compactación, carga,
+construcción de puentes y cubos, filtros, agregaciones de los gráficos y
+serialización de plotly. Los resultados se guardan en JSON para comparar
+entre commits.
+
+Uso:
+    python benchmark.py --countries 5 --years 1 --output base.json
+    python benchmark.py --countries 5 --years 1 --output nuevo.json --compare base.json
+    python benchmark.py --countries 50 --years 10 --data-dir /tmp/charts --no-memory
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import platform
+import shutil
+import string
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from analytics import MAX_PLOT_POINTS, adaptive_pivot, capped_long, member_position_pivot
+from chart_data import Dimensions, append_chart_data, build_chart_data, expand_dimension, top_ids
+from manifest import CSV_COLUMNS
+from rollups import append_rollups, build_rollups, query
+from storage import COUNTRIES, compact_country, load_country
+from streaks import longest_streaks
+
+START_DATE = date(2020, 1, 1)
+ROWS_PER_DAY = 200
+# Canciones nuevas por día, duración media en el chart y tamaño de los catálogos
+NEW_TRACKS_PER_DAY = 3
+MEAN_LIFETIME_DAYS = 45
+ARTISTS_PER_TRACK = 0.3
+LABELS = 80
+
+
+def country_codes(n):
+    """Los países reales primero y luego códigos sintéticos de dos letras"""
+    codes = list(COUNTRIES)
+    for pair in itertools.product(string.ascii_lowercase, repeat=2):
+        code = ''.join(pair)
+        if code not in codes:
+            codes.append(code)
+    return codes[:n]
+
+
+def generate_country(country_code, days, downloads_dir, rows_per_day=ROWS_PER_DAY, seed=0):
+    """Escribir ``days`` CSV diarios de un país desde ``START_DATE``.
+
+    Cada canción entra al chart en su fecha de lanzamiento y su popularidad
+    decae exponencialmente, así que las canciones permanecen semanas en el
+    chart como en los datos reales.
+    """
+    rng = np.random.default_rng([seed, sum(map(ord, country_code))])
+    warmup = 2 * MEAN_LIFETIME_DAYS
+    n_tracks = (days + warmup) * NEW_TRACKS_PER_DAY + rows_per_day
+    release = np.sort(rng.integers(-warmup, days, n_tracks))
+    peak = rng.lognormal(0.0, 0.8, n_tracks)
+    lifetime = rng.exponential(MEAN_LIFETIME_DAYS, n_tracks) + 3
+
+    # Artistas con popularidad muy desigual y colaboraciones de 1 a 3 artistas
+    n_artists = max(int(n_tracks * ARTISTS_PER_TRACK), 10)
+    artist_weights = 1.0 / np.arange(1, n_artists + 1) ** 0.9
+    artist_weights /= artist_weights.sum()
+    label_weights = 1.0 / np.arange(1, LABELS + 1)
+    label_weights /= label_weights.sum()
+    artist_names, label_names = [], []
+    for _ in range(n_tracks):
+        n = rng.choice([1, 2, 3], p=[0.7, 0.22, 0.08])
+        artists = rng.choice(n_artists, n, replace=False, p=artist_weights)
+        artist_names.append(", ".join(f"Artista {country_code.upper()}{a}" for a in artists))
+        labels = rng.choice(LABELS, rng.choice([1, 2], p=[0.8, 0.2]), replace=False, p=label_weights)
+        label_names.append(" / ".join(f"Label {l}" for l in labels))
+
+    csv_dir = os.path.join(downloads_dir, country_code)
+    os.makedirs(csv_dir, exist_ok=True)
+    for day in range(days):
+        lo, hi = np.searchsorted(release, [day - 10 * MEAN_LIFETIME_DAYS, day], side='right')
+        active = np.arange(lo, hi)
+        age = day - release[active]
+        score = peak[active] * np.exp(-age / lifetime[active]) * rng.lognormal(0.0, 0.05, len(active))
+        top = active[np.argsort(-score)[:rows_per_day]]
+        streams = np.sort(score)[::-1][:rows_per_day] * 150_000 + 50_000
+
+        date_str = (START_DATE + timedelta(days=day)).isoformat()
+        path = os.path.join(csv_dir, f"regional-{country_code}-daily-{date_str}.csv")
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            # Mismo formato que el botón: encabezado sin comillas y textos entre comillas
+            f.write(",".join(CSV_COLUMNS) + "\n")
+            writer = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC, lineterminator="\n")
+            for rank, (track, value) in enumerate(zip(top, streams), start=1):
+                writer.writerow([rank, f"spotify:track:{country_code}{track:020d}",
+                                 artist_names[track], f"Canción {track}", label_names[track],
+                                 rank, -1, int(day - release[track] + 1), str(int(value))])
+
+
+def measure(func, repeat=1, memory=True):
+    """Mejor tiempo de ``repeat`` ejecuciones y memoria pico de una ejecución aparte.
+
+    La memoria se mide con tracemalloc en una ejecución separada para que su
+    costo no afecte los tiempos; incluye Python, pandas y numpy pero no los
+    buffers internos de pyarrow.
+    """
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - started)
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        func()
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    return result, {'seconds': min(times), 'mean_seconds': sum(times) / len(times), 'peak_mb': peak_mb}
+
+
+def dashboard_stages(data, rollups, start_date, end_date, min_position=1, max_position=50):
+    """Etapas del dashboard para un filtro, en el mismo orden que ``dashboard.py``"""
+    import plotly.express as px
+
+    state = {}
+
+    def filter_rows():
+        state['rows'] = data.select(start_date, end_date, min_position, max_position)
+        return state['rows'].take_frame(data.df)
+
+    def metrics():
+        track_counts, track_streams = query(data, rollups, 'tracks', start_date, end_date, min_position, max_position)
+        artist_counts, _ = query(data, rollups, 'artists', start_date, end_date, min_position, max_position)
+        label_counts, _ = query(data, rollups, 'labels', start_date, end_date, min_position, max_position)
+        return (data.tracks['Track Name'][track_counts > 0].nunique(),
+                np.count_nonzero(artist_counts), np.count_nonzero(label_counts), track_streams.sum())
+
+    def number_ones():
+        positions = (max(min_position, 1), min(max_position, 1))
+        rows_number_ones = data.select(start_date, end_date, *positions)
+        for kind in ('tracks', 'artists', 'labels'):
+            query(data, rollups, kind, start_date, end_date, *positions)
+        number_ones_artists = expand_dimension(data, data.artists, rows_number_ones, 'Artist',
+                                               columns=('Track Name',))
+        return number_ones_artists.groupby('Artist', observed=True)['Track Name'].nunique()
+
+    def evolution():
+        counts, _ = query(data, rollups, 'artists', start_date, end_date, min_position, min(max_position, 10))
+        top_10_ids = top_ids(counts, 10)
+        pivot = member_position_pivot(data, data.artists, state['rows'], top_10_ids)
+        _, pivot = adaptive_pivot(pivot, MAX_PLOT_POINTS)
+        state['evolution'] = capped_long(pivot, 'Fecha', 'Artista', 'Posición',
+                                         key_names=data.artists.names[top_10_ids],
+                                         max_points=MAX_PLOT_POINTS)
+        return state['evolution']
+
+    def streaks():
+        return [longest_streaks(data, state['rows'], kind) for kind in ('tracks', 'artists', 'labels')]
+
+    def plotly_json():
+        fig = px.line(state['evolution'], x='Fecha', y='Posición', color='Artista', render_mode='webgl')
+        return fig.to_json()
+
+    return [('filter', filter_rows), ('metrics', metrics), ('number_ones', number_ones),
+            ('evolution', evolution), ('streaks', streaks), ('plotly', plotly_json)]
+
+
+def benchmark_country(country_code, downloads_dir, work_dir, repeat=1, memory=True):
+    """Medir todas las etapas de un país; devuelve una lista de resultados"""
+    results = []
+
+    def record(stage, func, stage_repeat=repeat):
+        result, stats = measure(func, stage_repeat, memory)
+        results.append({'country': country_code, 'stage': stage, **stats})
+        return result
+
+    # La compactación escribe en un almacén nuevo en cada ejecución
+    def compact():
+        store_dir = tempfile.mkdtemp(dir=work_dir)
+        compact_country(country_code, downloads_dir, store_dir)
+        return store_dir
+
+    store_dir = record('compact', compact, 1)
+    df = record('load', lambda: load_country(country_code, store_dir))
+    data = record('build_chart_data', lambda: build_chart_data(df))
+    rollups = record('build_rollups', lambda: build_rollups(data))
+
+    # Agregar el último día a datos ya cargados (actualización incremental)
+    last_day = df['date'].max()
+    dimensions = Dimensions()
+    base = build_chart_data(df[df['date'] < last_day], dimensions)
+    base_rollups = build_rollups(base)
+    new_df = df[df['date'] == last_day]
+
+    def append_day():
+        appended = append_chart_data(base, new_df, dimensions)
+        return append_rollups(base_rollups, appended, len(base.df))
+
+    record('append_day', append_day)
+
+    # Filtro por defecto del dashboard (todo el período, top 50) y uno parcial
+    start_date, end_date = data.df['date'].iloc[0], data.df['date'].iloc[-1]
+    middle = start_date + (end_date - start_date) / 2
+    filters = {
+        'full': (start_date, end_date, 1, 50),
+        'partial': (start_date + (end_date - start_date) / 5, middle, 3, 77),
+    }
+    for filter_name, (first, last, min_position, max_position) in filters.items():
+        for stage, func in dashboard_stages(data, rollups, first, last, min_position, max_position):
+            record(f"{stage}[{filter_name}]", func)
+
+    for result in results:
+        result['rows'] = len(data.df)
+    return results
+
+
+def summarize(results):
+    """Sumar cada etapa entre países"""
+    totals = {}
+    for result in results:
+        total = totals.setdefault(result['stage'], {'seconds': 0.0, 'peak_mb': None})
+        total['seconds'] += result['seconds']
+        if result['peak_mb'] is not None:
+            total['peak_mb'] = max(total['peak_mb'] or 0.0, result['peak_mb'])
+    return totals
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_summary(totals, baseline=None):
+    header = f"{'etapa':28} {'segundos':>10} {'pico MB':>9}"
+    if baseline is not None:
+        header += f" {'vs base':>8}"
+    print(header)
+    for stage, total in totals.items():
+        peak = f"{total['peak_mb']:.1f}" if total['peak_mb'] is not None else "-"
+        line = f"{stage:28} {total['seconds']:10.4f} {peak:>9}"
+        if baseline is not None and stage in baseline:
+            line += f" {total['seconds'] / max(baseline[stage]['seconds'], 1e-9):7.2f}x"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del dashboard con charts sintéticos")
+    parser.add_argument("--countries", type=int, default=5, help="Cantidad de países (5 a 50)")
+    parser.add_argument("--years", type=float, default=1, help="Años de datos diarios por país")
+    parser.add_argument("--rows", type=int, default=ROWS_PER_DAY, help="Filas por día")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Ejecuciones por etapa (se guarda la mejor)")
+    parser.add_argument("--data-dir", default=None,
+                        help="Carpeta para los CSV generados; se reutiliza si ya existen")
+    parser.add_argument("--no-memory", action="store_true", help="No medir memoria pico")
+    parser.add_argument("--output", default=None, help="Archivo JSON de resultados")
+    parser.add_argument("--compare", default=None, help="JSON de una corrida anterior para comparar")
+    args = parser.parse_args()
+
+    days = int(round(args.years * 365))
+    codes = country_codes(args.countries)
+    work_dir = tempfile.mkdtemp(prefix="spotify-bench-")
+    downloads_dir = args.data_dir or os.path.join(work_dir, "downloads")
+
+    try:
+        started = time.perf_counter()
+        for country_code in codes:
+            if os.path.isdir(os.path.join(downloads_dir, country_code)):
+                continue
+            generate_country(country_code, days, downloads_dir, args.rows, args.seed)
+        generate_seconds = time.perf_counter() - started
+        print(f"Datos: {len(codes)} países x {days} días x {args.rows} filas "
+              f"(generados en {generate_seconds:.1f}s)")
+
+        results = []
+        for country_code in codes:
+            results.extend(benchmark_country(country_code, downloads_dir, work_dir,
+                                             args.repeat, not args.no_memory))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'countries': len(codes),
+            'days': days,
+            'rows_per_day': args.rows,
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'generate_seconds': generate_seconds,
+        },
+        'results': results,
+        'totals': summarize(results),
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)['totals']
+    print_summary(report['totals'], baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,32 +5,141 @@ from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-import time
+from selenium.common.exceptions import SessionNotCreatedException, TimeoutException
 import os
-import json
 import sys
+import argparse
+import asyncio
+import shutil
+import statistics
+import threading
+import time
 from datetime import datetime, timedelta
 
-def load_failed_dates(country_code):
-    """Cargar fechas fallidas del archivo de registro"""
-    log_file = f"failed_dates_{country_code}.json"
-    if os.path.exists(log_file):
-        with open(log_file, 'r') as f:
-            return set(json.load(f))
-    return set()
-
-def save_failed_date(country_code, date):
-    """Guardar fecha fallida en el archivo de registro"""
-    log_file = f"failed_dates_{country_code}.json"
-    failed_dates = load_failed_dates(country_code)
-    failed_dates.add(date)
-    with open(log_file, 'w') as f:
-        json.dump(list(failed_dates), f)
-
-def setup_driver(download_dir):
+from download_watcher import DownloadWatcher
+from fast_fetch import API_URL, export_session, fetch_all, load_session, save_session
+from instrumentation import Recorder
+from jobs import MAX_ATTEMPTS_PER_RUN, JobJournal, JobScheduler
+from manifest import STATUS_OK, get_manifest
+
+VALID_COUNTRIES = {
+    "ar": "Argentina",
+    "cl": "Chile",
+    "uy": "Uruguay",
+    "mx": "México",
+    "es": "España"
+}
+
+# Puerto de debugging del primer navegador; cada worker usa el siguiente
+DEBUGGING_PORT = 9222
+
+CSV_BUTTON_SELECTOR = 'button[data-encore-id="buttonTertiary"][aria-labelledby="csv_download"]'
+
+# Código de salida cuando la sesión guardada ya no sirve (hay que volver a loguearse)
+EXIT_LOGIN_REQUIRED = 3
+LOGIN_URL_MARKER = "accounts.spotify.com"
+CHARTS_HOME = "https://charts.spotify.com/"
+# Página de cada fecha; con --chart-url se puede apuntar a charts_stub.py
+CHART_URL = "https://charts.spotify.com/charts/view/{chart}/{date}"
+
+# Ruta del chromedriver resuelta en una corrida anterior: evita consultar la red al arrancar
+DRIVER_CACHE_FILE = os.path.join("selenium", "chromedriver_path.txt")
+
+# Pedidos que no hacen falta para encontrar el botón de descarga (se bloquean por CDP)
+BLOCKED_URLS = [
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.ico",
+    "*.mp3", "*.mp4", "*.webm", "*.m4a",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*facebook.net*", "*hotjar.com*", "*/gabo-receiver-service/*",
+]
+
+# Segundos de espera por cada descarga (sin progreso) antes de darla por fallida
+DOWNLOAD_TIMEOUT = 10.0
+
+# Tiempos por etapa (carga de página, botón, confirmación) de toda la corrida
+recorder = Recorder("bot")
+
+class LoginRequired(Exception):
+    """La sesión guardada no permite descargar charts"""
+
+def chart_url(country_code, date):
+    return CHART_URL.format(chart=f"regional-{country_code}-daily", date=date)
+
+def csv_filename(country_code, date):
+    return f"regional-{country_code}-daily-{date}.csv"
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+def driver_path(refresh=False):
+    """Ruta del chromedriver: CHROMEDRIVER_PATH, la guardada en una corrida anterior o una nueva.
+
+    Solo se consulta la red (ChromeDriverManager) si no hay ninguna ruta válida
+    o si se pide ``refresh``; los workers de una corrida comparten la ruta.
+    """
+    global _driver_path
+    with _driver_path_lock:
+        if not refresh:
+            if _driver_path:
+                return _driver_path
+            candidate = os.environ.get("CHROMEDRIVER_PATH")
+            if not candidate and os.path.exists(DRIVER_CACHE_FILE):
+                with open(DRIVER_CACHE_FILE, 'r') as f:
+                    candidate = f.read().strip()
+            if candidate and os.path.exists(candidate):
+                _driver_path = candidate
+                return _driver_path
+        _driver_path = ChromeDriverManager().install()
+        os.makedirs(os.path.dirname(DRIVER_CACHE_FILE), exist_ok=True)
+        with open(DRIVER_CACHE_FILE, 'w') as f:
+            f.write(_driver_path)
+        return _driver_path
+
+def start_chrome(options):
+    try:
+        return webdriver.Chrome(service=Service(driver_path()), options=options)
+    except SessionNotCreatedException as e:
+        # El chromedriver guardado no coincide con la versión de Chrome instalada
+        print(f"Chromedriver desactualizado ({str(e).splitlines()[0]}); se resuelve de nuevo")
+        return webdriver.Chrome(service=Service(driver_path(refresh=True)), options=options)
+
+def block_requests(driver, patterns=BLOCKED_URLS):
+    """Bloquear fuentes, imágenes, analytics y media a nivel de red (CDP)"""
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+
+def use_single_tab(driver):
+    """Cerrar las pestañas que restaure el perfil y navegar siempre en una sola"""
+    handles = driver.window_handles
+    for handle in handles[1:]:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(handles[0])
+
+def prepare_driver(driver, optimized=True):
+    driver.set_page_load_timeout(20)  # Aumentar timeout
+    driver.implicitly_wait(2)  # Aumentar tiempo de espera implícito
+    if optimized:
+        block_requests(driver)
+        use_single_tab(driver)
+    return driver
+
+def setup_driver(download_dir, user_data_dir=None, debugging_port=DEBUGGING_PORT, headless=False,
+                 optimized=True):
+    """Chrome listo para descargar en ``download_dir``.
+
+    Con ``optimized`` (perfil por defecto) ``driver.get`` vuelve con el DOM
+    listo sin esperar imágenes, fuentes ni scripts diferidos (el botón se
+    busca luego con WebDriverWait), se bloquean los pedidos de ``BLOCKED_URLS``
+    y se usa una sola pestaña. ``optimized=False`` es el perfil original, para
+    comparar con ``--benchmark``.
+    """
     # Setup con optimizaciones de rendimiento
     options = Options()
-    user_data_dir = os.path.join(os.getcwd(), "selenium")
+    # Cada navegador concurrente necesita su propio perfil y puerto
+    if user_data_dir is None:
+        user_data_dir = os.path.join(os.getcwd(), "selenium")
     os.makedirs(user_data_dir, exist_ok=True)
     
     # Convertir el directorio de descargas a ruta absoluta
@@ -48,7 +157,13 @@ def setup_driver(download_dir):
     options.add_argument("--disable-logging")
     options.add_argument("--window-size=1920,1080")
     options.add_argument("--start-maximized")
-    options.add_argument("--remote-debugging-port=9222")  # Añadir puerto de debugging
+    options.add_argument(f"--remote-debugging-port={debugging_port}")  # Añadir puerto de debugging
+    if headless:
+        options.add_argument("--headless=new")
+    if optimized:
+        options.page_load_strategy = "eager"
+        options.add_argument("--no-first-run")
+        options.add_argument("--no-default-browser-check")
     
     # Configuraciones experimentales para optimizar rendimiento
     options.add_experimental_option("excludeSwitches", ["enable-automation", "enable-logging"])
@@ -64,11 +179,7 @@ def setup_driver(download_dir):
     })
     
     try:
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=options)
-        driver.set_page_load_timeout(20)  # Aumentar timeout
-        driver.implicitly_wait(2)  # Aumentar tiempo de espera implícito
-        return driver
+        return prepare_driver(start_chrome(options), optimized)
     except Exception as e:
         print(f"Error al iniciar Chrome: {str(e)}")
         # Intentar con configuración mínima si falla
@@ -76,123 +187,529 @@ def setup_driver(download_dir):
         options.add_argument(f"--user-data-dir={user_data_dir}")
         options.add_argument("--disable-gpu")
         options.add_argument("--no-sandbox")
+        if headless:
+            options.add_argument("--headless=new")
+        if optimized:
+            options.page_load_strategy = "eager"
         options.add_experimental_option("prefs", {
             "download.default_directory": download_dir_abs,
             "download.prompt_for_download": False
         })
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=options)
-        driver.set_page_load_timeout(20)
-        driver.implicitly_wait(2)
-        return driver
+        return prepare_driver(start_chrome(options), optimized)
+
+def set_download_dir(driver, download_dir):
+    """Cambiar la carpeta de descargas de un navegador ya abierto"""
+    driver.execute_cdp_cmd("Page.setDownloadBehavior", {
+        "behavior": "allow",
+        "downloadPath": os.path.abspath(download_dir)
+    })
+
+def load_session_cookies(driver, session_file):
+    """Cargar en el navegador las cookies de un archivo de sesión guardado"""
+    session = load_session(session_file)
+    try:
+        driver.get(CHARTS_HOME)
+    except:
+        driver.execute_script("window.stop();")
+    for cookie in session.get('browser_cookies', []):
+        cookie = {key: value for key, value in cookie.items()
+                  if key in ('name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'expiry')}
+        try:
+            driver.add_cookie(cookie)
+        except Exception as e:
+            print(f"No se pudo cargar la cookie {cookie['name']}: {e}")
+
+def check_session(driver, wait, url):
+    """Verificar que la sesión permita ver el botón de descarga de un chart"""
+    try:
+        driver.get(url)
+    except:
+        driver.execute_script("window.stop();")
+    if LOGIN_URL_MARKER in driver.current_url:
+        raise LoginRequired(f"Redirigido al login: {driver.current_url}")
+    try:
+        wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, CSV_BUTTON_SELECTOR)))
+    except TimeoutException:
+        raise LoginRequired("No se encontró el botón de descarga con la sesión guardada")
+
+def open_charts(driver, wait, url, prompt, headless=False, session_file=None):
+    """Dejar el navegador listo para descargar.
+
+    En modo interactivo se abre la página y se espera el Enter del usuario
+    (guardando la sesión si se indicó ``session_file``). En modo headless se
+    cargan las cookies guardadas, si las hay, y se valida la sesión sin
+    intervención; si no sirve se lanza ``LoginRequired``.
+    """
+    if headless:
+        if session_file and os.path.exists(session_file):
+            load_session_cookies(driver, session_file)
+        check_session(driver, wait, url)
+        return
+    
+    try:
+        driver.get(url)
+    except:
+        print("Timeout al cargar la página, intentando continuar...")
+        driver.execute_script("window.stop();")
+    if prompt:
+        input(prompt)
+        if session_file:
+            save_session(export_session(driver), session_file)
+            print(f"Sesión guardada en {session_file}")
+
+def pending_dates(country_code, start_date, end_date, download_dir, journal):
+    """Fechas del rango sin un CSV válido, salvo las que esperan su reintento o se abandonaron.
+
+    Se consulta el manifiesto del país en lugar de listar la carpeta; los
+    archivos truncados o inválidos se apartan para volver a descargarlos.
+    """
+    dates = [(start_date + timedelta(days=x)).strftime("%Y-%m-%d") 
+            for x in range((end_date - start_date).days + 1)]
+    manifest = get_manifest(country_code, os.path.dirname(download_dir))
+    damaged = manifest.damaged()
+    if damaged:
+        print(f"Archivos incompletos o inválidos en {country_code.upper()}: {len(damaged)} (se vuelven a descargar)")
+        manifest.quarantine(damaged)
+    blocked_dates = journal.blocked_dates(country_code)
+    return [date for date in dates 
+            if manifest.status(date) is None
+            and date not in blocked_dates]
+
+def queue_jobs(country_codes, start_date, end_date, base_dir, journal):
+    """Lista de (país, fecha) pendientes de todos los países"""
+    jobs = []
+    for country_code in country_codes:
+        download_dir = os.path.join(os.getcwd(), base_dir, country_code)
+        os.makedirs(download_dir, exist_ok=True)
+        dates_to_download = pending_dates(country_code, start_date, end_date, download_dir, journal)
+        print(f"Total de archivos a descargar para {country_code.upper()}: {len(dates_to_download)}")
+        jobs.extend((country_code, date) for date in dates_to_download)
+    return jobs
+
+def start_download(driver, wait, country_code, date):
+    """Abrir la página de una fecha y hacer clic en el botón de descarga.
+
+    Devuelve None si se inició la descarga o el error si falló.
+    """
+    try:
+        with recorder.time("page_load"):
+            driver.get(chart_url(country_code, date))
+    except:
+        recorder.count("page_load_timeouts")
+        driver.execute_script("window.stop();")  # Detener carga si toma demasiado tiempo
+    
+    try:
+        print("Buscando botón de descarga...")
+        with recorder.time("wait_button"):
+            download_button = wait.until(EC.presence_of_element_located((
+                By.CSS_SELECTOR, CSV_BUTTON_SELECTOR
+            )))
+        print("Botón encontrado, haciendo clic...")
+        driver.execute_script("arguments[0].click();", download_button)  # Click con JavaScript
+        print(f"Descargando CSV para {date}...")
+        return None
+    except Exception as e:
+        print(f"Fallo en {date}: {e}")
+        driver.save_screenshot(f"error_{country_code}_{date}.png")
+        print(f"Se guardó un screenshot como error_{country_code}_{date}.png")
+        return e
+
+def register_download(country_code, date, path, scheduler):
+    """Validar un archivo descargado y registrarlo en el manifiesto y en el journal.
+
+    Un archivo truncado o que no es un CSV de charts se aparta y la fecha
+    queda como fallida para volver a descargarla.
+    """
+    downloads_root = os.path.dirname(os.path.dirname(os.path.abspath(path)))
+    manifest = get_manifest(country_code, downloads_root, refresh=False)
+    entry = manifest.record(path)
+    if entry['status'] == STATUS_OK:
+        scheduler.done(country_code, date)
+        return True
+    print(f"¡Archivo {entry['status']} para {country_code.upper()} {date}: {entry['error']}!")
+    manifest.quarantine([entry])
+    recorder.count("invalid_downloads")
+    scheduler.failed(country_code, date, f"Archivo {entry['status']}: {entry['error']}")
+    return False
+
+def record_downloads(results, scheduler, base_dir=None):
+    """Registrar en el journal las descargas terminadas y fallidas del watcher.
+
+    Las claves son (país, fecha). Si se indica ``base_dir`` los archivos se
+    mueven desde la carpeta del worker a la del país.
+    """
+    completed, failed = results
+    for (country_code, date), path in completed:
+        if base_dir is not None:
+            country_dir = os.path.join(os.getcwd(), base_dir, country_code)
+            path = shutil.move(path, os.path.join(country_dir, csv_filename(country_code, date)))
+        print(f"Archivo descargado: {csv_filename(country_code, date)}")
+        recorder.count("downloads")
+        register_download(country_code, date, path, scheduler)
+    for country_code, date in failed:
+        print(f"¡Advertencia: No se detectó archivo para {country_code.upper()} {date}!")
+        recorder.count("download_failures")
+        scheduler.failed(country_code, date, "No se detectó el archivo descargado")
 
-def download_country_data(country_code, start_date, end_date, base_dir):
+def run_jobs(driver, wait, scheduler, watcher, base_dir=None, leased=None):
+    """Descargar con el navegador los trabajos del scheduler hasta agotarlos.
+
+    ``leased`` (un set) queda con los trabajos tomados y todavía sin registrar,
+    para devolverlos al scheduler si el navegador falla.
+    """
+    clicked_at = {}
+    leased = set() if leased is None else leased
+    
+    def finish(results):
+        # Tiempo desde el clic hasta que el archivo quedó completo
+        for job, _ in results[0]:
+            recorder.observe("download_confirm", time.perf_counter() - clicked_at.pop(job))
+        for job in results[1]:
+            clicked_at.pop(job, None)
+        record_downloads(results, scheduler, base_dir)
+        leased.difference_update(job for job, _ in results[0])
+        leased.difference_update(results[1])
+    
+    while True:
+        # Con descargas propias en curso no se bloquea: un reintento puede depender de ellas
+        job = scheduler.next_job(block=not watcher.pending)
+        if job is None:
+            if not watcher.pending:
+                break
+            finish(watcher.wait(until_pending=len(watcher.pending) - 1))
+            continue
+        leased.add(job)
+        country_code, date = job
+        print(f"\nProcesando {country_code.upper()} - fecha: {date}")
+        error = start_download(driver, wait, country_code, date)
+        if error is None:
+            clicked_at[job] = time.perf_counter()
+            watcher.expect(job, csv_filename(country_code, date))
+        else:
+            recorder.count("button_failures")
+            leased.discard(job)
+            scheduler.failed(country_code, date, error)
+        # La siguiente navegación se superpone con el final de esta descarga
+        finish(watcher.throttle())
+    
+    finish(watcher.drain())
+
+def download_country_data(country_code, start_date, end_date, base_dir, journal,
+                          download_timeout=DOWNLOAD_TIMEOUT, headless=False, session_file=None,
+                          max_retries=MAX_ATTEMPTS_PER_RUN):
     # Crear directorio específico para el país
     download_dir = os.path.join(os.getcwd(), base_dir, country_code)
     os.makedirs(download_dir, exist_ok=True)
     
-    # Cargar fechas fallidas conocidas
-    failed_dates = load_failed_dates(country_code)
-    
     # Configurar el driver para este país
-    driver = setup_driver(download_dir)
+    driver = setup_driver(download_dir, headless=headless)
     wait = WebDriverWait(driver, 5)  # Aumentar tiempo de espera explícito
     
     try:
-        # Loguearse en Spotify Charts
-        initial_url = f"https://charts.spotify.com/charts/view/regional-{country_code}-daily/{start_date.strftime('%Y-%m-%d')}"
-        try:
-            driver.get(initial_url)
-        except:
-            print("Timeout al cargar la página, intentando continuar...")
-            driver.execute_script("window.stop();")
-        
-        # Pedir confirmación para cada país
-        input(f"Presiona Enter para comenzar la descarga de {country_code.upper()}...")
-        
-        # Generar fechas
-        dates = [(start_date + timedelta(days=x)).strftime("%Y-%m-%d") 
-                for x in range((end_date - start_date).days + 1)]
+        # Loguearse en Spotify Charts (o validar la sesión guardada en modo headless)
+        initial_url = chart_url(country_code, start_date.strftime('%Y-%m-%d'))
+        open_charts(driver, wait, initial_url,
+                    f"Presiona Enter para comenzar la descarga de {country_code.upper()}...",
+                    headless, session_file)
         
-        # Verificar archivos existentes
-        existing_files = set(os.listdir(download_dir))
+        # Verificar archivos existentes (según el manifiesto validado)
+        existing_files = get_manifest(country_code, os.path.dirname(download_dir)).valid_files()
         print(f"\nArchivos existentes en {country_code.upper()}: {len(existing_files)}")
         
-        # Filtrar fechas que ya están descargadas o han fallado previamente
-        dates_to_download = [date for date in dates 
-                        if f"regional-{country_code}-daily-{date}.csv" not in existing_files
-                        and date not in failed_dates]
+        # Filtrar fechas que ya están descargadas o esperan su próximo reintento
+        dates_to_download = pending_dates(country_code, start_date, end_date, download_dir, journal)
         
         print(f"Total de archivos a descargar para {country_code.upper()}: {len(dates_to_download)}")
-        print(f"Fechas previamente fallidas: {len(failed_dates)}")
+        print(f"Fechas en espera de reintento o abandonadas: {len(journal.blocked_dates(country_code))}")
         
         if len(dates_to_download) == 0:
             print(f"¡Todos los archivos disponibles ya están descargados para {country_code.upper()}!")
             return
         
-        for date in dates_to_download:
-            print(f"\nProcesando {country_code.upper()} - fecha: {date}")
-            url = f"https://charts.spotify.com/charts/view/regional-{country_code}-daily/{date}"
-            try:
-                driver.get(url)
-            except:
-                driver.execute_script("window.stop();")  # Detener carga si toma demasiado tiempo
-            
-            try:
-                print("Buscando botón de descarga...")
-                download_button = wait.until(EC.presence_of_element_located((
-                    By.CSS_SELECTOR, 
-                    'button[data-encore-id="buttonTertiary"][aria-labelledby="csv_download"]'
-                )))
-                print("Botón encontrado, haciendo clic...")
-                driver.execute_script("arguments[0].click();", download_button)  # Click con JavaScript
-                
-                # Verificar si el archivo se descargó
-                print(f"Descargando CSV para {date}...")
-                time.sleep(0.5)  # Reducir pausa para verificar descarga
-                downloaded_files = set(os.listdir(download_dir))
-                new_files = downloaded_files - existing_files
-                if new_files:
-                    print(f"Archivo descargado: {new_files}")
-                    existing_files = downloaded_files
-                else:
-                    print(f"¡Advertencia: No se detectó archivo para {date}!")
-                    save_failed_date(country_code, date)
-                
-            except Exception as e:
-                print(f"Fallo en {date}: {e}")
-                save_failed_date(country_code, date)
-                driver.save_screenshot(f"error_{country_code}_{date}.png")
-                print(f"Se guardó un screenshot como error_{country_code}_{date}.png")
+        scheduler = JobScheduler(journal, [(country_code, date) for date in dates_to_download], max_retries)
+        watcher = DownloadWatcher(download_dir, timeout=download_timeout)
+        run_jobs(driver, wait, scheduler, watcher)
     
     finally:
         driver.quit()
 
-def main():
-    # Verificar argumentos
-    valid_countries = ["ar", "cl", "uy", "mx", "es"]
-    if len(sys.argv) != 2 or sys.argv[1] not in valid_countries:
-        print("Uso: python bot.py [ar|cl|uy|mx|es]")
-        print("ar: Argentina")
-        print("cl: Chile")
-        print("uy: Uruguay")
-        print("mx: México")
-        print("es: España")
-        sys.exit(1)
+def run_worker(worker_id, scheduler, start_event, base_dir, first_url, download_timeout=DOWNLOAD_TIMEOUT,
+               headless=False, session_file=None, login_required=None, on_login=None):
+    """Worker con su propio Chrome: perfil, puerto y carpeta de descargas aislados.
+
+    Si el navegador falla, el error se informa y los trabajos que tenía
+    tomados vuelven a la cola para los demás workers.
+    """
+    leased = set()
+    try:
+        _run_worker(worker_id, scheduler, start_event, base_dir, first_url, download_timeout,
+                    headless, session_file, login_required, on_login, leased)
+    except Exception as e:
+        print(f"[worker {worker_id}] Error, se devuelven {len(leased)} fechas a la cola: {e!r}")
+        recorder.count("worker_errors")
+        for country_code, date in leased:
+            scheduler.release(country_code, date)
+
+def _run_worker(worker_id, scheduler, start_event, base_dir, first_url, download_timeout,
+                headless, session_file, login_required, on_login, leased):
+    staging_dir = os.path.join(os.getcwd(), base_dir, ".workers", f"worker-{worker_id}")
+    os.makedirs(staging_dir, exist_ok=True)
+    user_data_dir = os.path.join(os.getcwd(), "selenium", f"worker-{worker_id}")
+    driver = setup_driver(staging_dir, user_data_dir, DEBUGGING_PORT + worker_id, headless)
+    wait = WebDriverWait(driver, 5)
+    watcher = DownloadWatcher(staging_dir, timeout=download_timeout)
+    
+    try:
+        # Abrir Spotify Charts para poder loguearse en este perfil
+        try:
+            open_charts(driver, wait, first_url, None, headless, session_file)
+        except LoginRequired as e:
+            print(f"[worker {worker_id}] {e}")
+            login_required.set()
+            return
+        start_event.wait()
+        if on_login is not None and not headless:
+            on_login(driver)
+        
+        run_jobs(driver, wait, scheduler, watcher, base_dir, leased)
+    finally:
+        driver.quit()
+
+def download_concurrently(country_codes, start_date, end_date, base_dir, journal, workers,
+                          download_timeout=DOWNLOAD_TIMEOUT, headless=False, session_file=None,
+                          max_retries=MAX_ATTEMPTS_PER_RUN):
+    """Descargar varios países en paralelo con una cola compartida de (país, fecha)"""
+    jobs = queue_jobs(country_codes, start_date, end_date, base_dir, journal)
+    if not jobs:
+        print("¡Todos los archivos disponibles ya están descargados!")
+        return
+    
+    scheduler = JobScheduler(journal, jobs, max_retries)
+    workers = min(workers, len(jobs))
+    start_event = threading.Event()
+    login_required = threading.Event()
+    first_url = chart_url(country_codes[0], start_date.strftime('%Y-%m-%d'))
+    
+    # Como con un solo navegador: la sesión se guarda una vez, del primero que quedó logueado
+    save_lock = threading.Lock()
+    session_saved = threading.Event()
+    
+    def save_login(driver):
+        with save_lock:
+            if session_saved.is_set() or not driver.find_elements(By.CSS_SELECTOR, CSV_BUTTON_SELECTOR):
+                return
+            save_session(export_session(driver), session_file)
+            session_saved.set()
+            print(f"Sesión guardada en {session_file}")
+    
+    threads = [
+        threading.Thread(target=run_worker,
+                         args=(worker_id, scheduler, start_event, base_dir, first_url, download_timeout,
+                               headless, session_file, login_required, save_login if session_file else None))
+        for worker_id in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    
+    # Un solo Enter para todos los navegadores (loguearse en cada uno antes)
+    if not headless:
+        input(f"Presiona Enter para comenzar la descarga con {workers} navegadores...")
+    start_event.set()
+    for thread in threads:
+        thread.join()
+    if session_file and not headless and not session_saved.is_set():
+        print(f"¡Advertencia: ningún navegador mostraba el botón de descarga; no se guardó {session_file}!")
+    if login_required.is_set():
+        raise LoginRequired("Al menos un navegador no tiene una sesión válida")
+
+def download_fast(country_codes, start_date, end_date, base_dir, journal, api_url=API_URL,
+                  download_timeout=DOWNLOAD_TIMEOUT, headless=False, session_file=None,
+                  max_retries=MAX_ATTEMPTS_PER_RUN):
+    """Loguearse una vez con el navegador y descargar las fechas por HTTP.
+
+    Si el servidor rechaza la sesión, las fechas que quedaron pendientes se
+    descargan con el mismo navegador.
+    """
+    jobs = queue_jobs(country_codes, start_date, end_date, base_dir, journal)
+    if not jobs:
+        print("¡Todos los archivos disponibles ya están descargados!")
+        return
+    
+    scheduler = JobScheduler(journal, jobs, max_retries)
+    staging_dir = os.path.join(os.getcwd(), base_dir, ".workers", "fast")
+    os.makedirs(staging_dir, exist_ok=True)
+    first_country, first_date = jobs[0]
+    driver = setup_driver(staging_dir, headless=headless)
+    wait = WebDriverWait(driver, 5)
+    
+    try:
+        open_charts(driver, wait, chart_url(first_country, first_date),
+                    "Presiona Enter cuando hayas iniciado sesión en Spotify Charts...",
+                    headless, session_file)
+        session = export_session(driver)
+        
+        def report_failure(country_code, date, error):
+            print(f"Fallo en {country_code.upper()} {date}: {error}")
+            scheduler.failed(country_code, date, error)
         
-    country = sys.argv[1]
+        # Cada tanda incluye los reintentos que vencieron mientras se descargaba la anterior
+        downloaded_total, pending = 0, []
+        while not pending:
+            batch = scheduler.next_batch()
+            if not batch:
+                break
+            with recorder.time("http_batch"):
+                downloaded, pending = asyncio.run(fetch_all(
+                    batch, session, base_dir, api_url, on_failure=report_failure
+                ))
+            recorder.count("http_downloads", len(downloaded))
+            for country_code, date in downloaded:
+                register_download(country_code, date,
+                                  os.path.join(base_dir, country_code, csv_filename(country_code, date)),
+                                  scheduler)
+            for country_code, date in pending:
+                scheduler.release(country_code, date)
+            downloaded_total += len(downloaded)
+        print(f"\nDescargados por HTTP: {downloaded_total}")
+        
+        # Lo que quedó pendiente por errores de autenticación sigue por el navegador
+        if pending:
+            watcher = DownloadWatcher(staging_dir, timeout=download_timeout)
+            run_jobs(driver, wait, scheduler, watcher, base_dir)
+    finally:
+        driver.quit()
+
+def benchmark_pages(country_code, dates, base_dir, headless=False):
+    """Latencia por fecha (página, botón y descarga) del perfil original y del optimizado.
+
+    Pensado para correr contra ``charts_stub.py`` con ``--chart-url``; cada
+    fecha se descarga de a una para medir su latencia completa.
+    """
+    results = {}
+    for profile, optimized in (("original", False), ("optimizado", True)):
+        staging_dir = os.path.join(os.getcwd(), base_dir, ".workers", f"benchmark-{profile}")
+        os.makedirs(staging_dir, exist_ok=True)
+        user_data_dir = os.path.join(os.getcwd(), "selenium", f"benchmark-{profile}")
+        started = time.perf_counter()
+        driver = setup_driver(staging_dir, user_data_dir, headless=headless, optimized=optimized)
+        startup = time.perf_counter() - started
+        wait = WebDriverWait(driver, 5)
+        watcher = DownloadWatcher(staging_dir)
+        latencies = []
+        try:
+            for date in dates:
+                path = os.path.join(staging_dir, csv_filename(country_code, date))
+                if os.path.exists(path):
+                    os.remove(path)  # Chrome no sobrescribe: crearía "archivo (1).csv"
+                started = time.perf_counter()
+                if start_download(driver, wait, country_code, date) is not None:
+                    continue
+                watcher.expect(date, csv_filename(country_code, date))
+                completed, _ = watcher.drain()
+                if completed:
+                    latencies.append(time.perf_counter() - started)
+        finally:
+            driver.quit()
+        results[profile] = (startup, latencies)
+    
+    print(f"\n{'perfil':12} {'arranque':>9} {'ok':>7} {'media':>8} {'p50':>8} {'p95':>8} {'máximo':>8}")
+    for profile, (startup, latencies) in results.items():
+        if not latencies:
+            print(f"{profile:12} {startup:8.2f}s {0:>3}/{len(dates):<3} sin descargas")
+            continue
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+        print(f"{profile:12} {startup:8.2f}s {len(latencies):>3}/{len(dates):<3} "
+              f"{statistics.mean(latencies) * 1000:7.0f}ms {statistics.median(latencies) * 1000:7.0f}ms "
+              f"{p95 * 1000:7.0f}ms {max(latencies) * 1000:7.0f}ms")
+    return results
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"debe ser al menos 1: {value}")
+    return number
+
+def main():
+    global CHART_URL
+    parser = argparse.ArgumentParser(
+        description="Descargar los charts diarios de Spotify",
+        epilog="Países: " + ", ".join(f"{code}: {name}" for code, name in VALID_COUNTRIES.items())
+    )
+    parser.add_argument("countries", nargs="+", choices=list(VALID_COUNTRIES),
+                        metavar="pais", help="Códigos de país (ar, cl, uy, mx, es)")
+    parser.add_argument("--workers", type=positive_int, default=1,
+                        help="Navegadores en paralelo (por defecto 1)")
+    parser.add_argument("--download-timeout", type=float, default=DOWNLOAD_TIMEOUT,
+                        help="Segundos sin progreso antes de dar una descarga por fallida")
+    parser.add_argument("--fast", action="store_true",
+                        help="Descargar por HTTP reutilizando la sesión del navegador")
+    parser.add_argument("--api-url", default=API_URL,
+                        help="Plantilla de URL con {chart} y {date} para --fast")
+    parser.add_argument("--headless", action="store_true",
+                        help="Sin ventana ni confirmaciones; valida la sesión guardada antes de empezar")
+    parser.add_argument("--session", default=None,
+                        help="Archivo de sesión: se guarda al loguearse y se carga en modo headless")
+    parser.add_argument("--max-retries", type=positive_int, default=MAX_ATTEMPTS_PER_RUN,
+                        help="Intentos por fecha dentro de esta corrida (por defecto 3)")
+    parser.add_argument("--metrics", default=None,
+                        help="Guardar los tiempos por etapa en un .jsonl o un textfile de Prometheus (.prom)")
+    parser.add_argument("--chart-url", default=CHART_URL,
+                        help="Plantilla de URL de la página de cada fecha, con {chart} y {date}")
+    parser.add_argument("--benchmark", type=int, default=0, metavar="N",
+                        help="Medir la latencia por fecha de N fechas con el perfil original y el optimizado")
+    args = parser.parse_args()
+    CHART_URL = args.chart_url
     
     # Configuración base
     base_dir = "spotify_downloads"
     os.makedirs(base_dir, exist_ok=True)
     
+    if args.benchmark:
+        first_date = datetime(2024, 1, 1)
+        dates = [(first_date + timedelta(days=x)).strftime("%Y-%m-%d") for x in range(args.benchmark)]
+        benchmark_pages(args.countries[0], dates, base_dir, args.headless)
+        return
+    
+    # Estado de las descargas; los registros JSON anteriores se migran una sola vez
+    journal = JobJournal()
+    migrated = journal.import_failed_dates()
+    if migrated:
+        print(f"Fechas fallidas migradas al journal: {migrated}")
+    
     # Fechas para la descarga
     start_date = datetime(2020, 1, 1)
     end_date = datetime.now()
     
-    print(f"\nIniciando descarga para {country.upper()}")
-    download_country_data(country, start_date, end_date, base_dir)
+    try:
+        if args.fast:
+            print(f"\nIniciando descarga por HTTP para {', '.join(c.upper() for c in args.countries)}")
+            download_fast(args.countries, start_date, end_date, base_dir, journal, args.api_url,
+                          args.download_timeout, args.headless, args.session, args.max_retries)
+        elif len(args.countries) == 1 and args.workers == 1:
+            country = args.countries[0]
+            print(f"\nIniciando descarga para {country.upper()}")
+            download_country_data(country, start_date, end_date, base_dir, journal,
+                                  args.download_timeout, args.headless, args.session, args.max_retries)
+        else:
+            print(f"\nIniciando descarga para {', '.join(c.upper() for c in args.countries)} "
+                  f"con {args.workers} navegadores")
+            download_concurrently(args.countries, start_date, end_date, base_dir, journal, args.workers,
+                                  args.download_timeout, args.headless, args.session, args.max_retries)
+    except LoginRequired as e:
+        print(f"\nSe requiere volver a iniciar sesión: {e}")
+        print("Ejecuta el bot sin --headless (con --session) para loguearte y guardar la sesión.")
+        sys.exit(EXIT_LOGIN_REQUIRED)
+    finally:
+        if args.metrics:
+            recorder.write(args.metrics, countries=",".join(args.countries))
+    
+    print("\nTiempos por etapa:")
+    for stage, stats in recorder.summary().items():
+        print(f"{stage}: {stats['calls']} veces, {stats['seconds']:.1f}s en total, máximo {stats['max_seconds']:.1f}s")
     
+    gaps = journal.gaps()
+    if gaps:
+        print(f"\nFechas sin descargar: {len(gaps)} (detalle con: python jobs.py gaps)")
     print("\n¡Descarga completada!")
 
 if __name__ == "__main__":
@@ -0,0 +1,524 @@
+"""Datos de charts con dimensiones de canciones, artistas y labels codificadas.
+
+Las canciones (por URI de Spotify), artistas y labels viven una sola vez en
+dimensiones compartidas por todos los países. Cada país guarda una tabla de
+hechos angosta (fecha, posición, streams e id de canción) más dos tablas
+puente ``(row_id, artist_id)`` y ``(row_id, label_id)`` en int32, así que los
+ids son comparables entre países. Los puentes salen de los artistas y labels
+de cada fila, no de la canción: si una canción cambia de label, cada fecha
+conserva el suyo.
+
+Las filas se mantienen ordenadas por (fecha, posición) y un índice de fechas
+permite resolver los filtros por búsqueda binaria en lugar de máscaras sobre
+todo el DataFrame.
+"""
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+ARTIST_SEPARATOR = ', '
+LABEL_SEPARATOR = ' / '
+
+# Separación entre días en la clave compuesta (día, posición) del índice
+POSITION_STRIDE = 1024
+
+
+def to_day(value):
+    """Convertir una fecha (date, datetime o Timestamp) a días desde 1970-01-01"""
+    return int(np.datetime64(value, 'D').astype(np.int64))
+
+
+def _expand_ranges(starts, ends):
+    """Índices de todas las filas de los rangos [start, end)"""
+    lengths = ends - starts
+    total = int(lengths.sum())
+    offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    return offsets + np.arange(total)
+
+
+@dataclass
+class RowRanges:
+    """Selección de filas como rangos contiguos [start, end) ordenados"""
+    starts: np.ndarray
+    ends: np.ndarray
+
+    def __len__(self):
+        return int((self.ends - self.starts).sum())
+
+    def indices(self):
+        return _expand_ranges(self.starts, self.ends)
+
+    def take(self, values):
+        """Valores de las filas seleccionadas (sin copia si es un solo rango)"""
+        if len(self.starts) == 1:
+            return values[self.starts[0]:self.ends[0]]
+        return values[self.indices()]
+
+    def take_frame(self, df):
+        if len(self.starts) == 1:
+            return df.iloc[self.starts[0]:self.ends[0]]
+        return df.take(self.indices())
+
+    def slice(self, start, stop):
+        """Filas ``start:stop`` de la selección, sin expandir el resto"""
+        lengths = self.ends - self.starts
+        bounds = np.concatenate([[0], np.cumsum(lengths)])
+        stop = min(stop, int(bounds[-1]))
+        if start >= stop:
+            return RowRanges(self.starts[:0], self.ends[:0])
+        first = int(np.searchsorted(bounds, start, side='right')) - 1
+        last = int(np.searchsorted(bounds, stop, side='left'))
+        starts = self.starts[first:last].copy()
+        ends = self.ends[first:last].copy()
+        starts[0] += start - bounds[first]
+        ends[-1] = self.starts[last - 1] + stop - bounds[last - 1]
+        return RowRanges(starts, ends)
+
+    def map(self, sorted_row_ids):
+        """Rangos equivalentes dentro de un arreglo ordenado de row_ids"""
+        return RowRanges(
+            np.searchsorted(sorted_row_ids, self.starts, side='left'),
+            np.searchsorted(sorted_row_ids, self.ends, side='left'),
+        )
+
+    @staticmethod
+    def concat(*selections):
+        starts = np.concatenate([selection.starts for selection in selections])
+        ends = np.concatenate([selection.ends for selection in selections])
+        order = np.argsort(starts, kind='stable')
+        return RowRanges(starts[order], ends[order])
+
+
+@dataclass
+class DateIndex:
+    """Índice de las filas ordenadas por (fecha, posición)"""
+    days: np.ndarray      # int32, días distintos ordenados
+    offsets: np.ndarray   # int64, primera fila de cada día (más el total al final)
+    row_keys: np.ndarray  # int64, día_índice * POSITION_STRIDE + posición
+
+    @classmethod
+    def build(cls, dates, positions):
+        row_days = dates.astype('datetime64[D]').astype(np.int64)
+        days, offsets = np.unique(row_days, return_index=True)
+        offsets = np.append(offsets, len(row_days)).astype(np.int64)
+        day_index = np.repeat(np.arange(len(days)), np.diff(offsets))
+        return cls(
+            days=days.astype(np.int32),
+            offsets=offsets,
+            row_keys=day_index * POSITION_STRIDE + positions,
+        )
+
+    def extend(self, dates, positions):
+        """Índice con filas nuevas (de días posteriores) agregadas al final"""
+        added = DateIndex.build(dates, positions)
+        return DateIndex(
+            days=np.concatenate([self.days, added.days]),
+            offsets=np.concatenate([self.offsets[:-1], added.offsets + self.offsets[-1]]),
+            row_keys=np.concatenate([self.row_keys, added.row_keys + len(self.days) * POSITION_STRIDE]),
+        )
+
+    def day_range(self, start_date, end_date):
+        """Posiciones [i0, i1) en ``days`` de las fechas del rango"""
+        i0 = np.searchsorted(self.days, to_day(start_date), side='left')
+        i1 = np.searchsorted(self.days, to_day(end_date), side='right')
+        return int(i0), int(max(i0, i1))
+
+    def select(self, start_date, end_date, min_position=1, max_position=POSITION_STRIDE - 1):
+        """Filas del rango de fechas y posiciones por búsqueda binaria.
+
+        Si todas las posiciones del rango de días entran en el filtro el
+        resultado es un único rango contiguo; si no, un rango por día.
+        """
+        i0, i1 = self.day_range(start_date, end_date)
+        if i0 == i1 or min_position > max_position:
+            return RowRanges(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+        # Como cada día está ordenado por posición, su primera y última fila
+        # dan el rango de posiciones presentes
+        day_first = self.row_keys[self.offsets[i0:i1]] % POSITION_STRIDE
+        day_last = self.row_keys[self.offsets[i0 + 1:i1 + 1] - 1] % POSITION_STRIDE
+        if day_first.min() >= min_position and day_last.max() <= max_position:
+            return RowRanges(self.offsets[i0:i0 + 1], self.offsets[i1:i1 + 1])
+        day_keys = np.arange(i0, i1, dtype=np.int64) * POSITION_STRIDE
+        starts = np.searchsorted(self.row_keys, day_keys + min_position, side='left')
+        ends = np.searchsorted(self.row_keys, day_keys + max_position, side='right')
+        keep = ends > starts
+        return RowRanges(starts[keep], ends[keep])
+
+
+@dataclass
+class Bridge:
+    """Tabla puente fila -> miembro de una dimensión (artista o label)"""
+    names: np.ndarray     # nombre de cada id de la dimensión
+    row_ids: np.ndarray   # int32, ordenado por fila
+    ids: np.ndarray       # int32, id de la dimensión para cada row_id
+    row_codes: np.ndarray  # int32, código del texto ('Artist' o 'Label') de cada fila en ``lists``
+    lists: 'MemberLists'   # textos distintos y sus miembros
+
+    def select(self, rows):
+        """Ids de la dimensión vinculados a las filas seleccionadas"""
+        return rows.map(self.row_ids).take(self.ids)
+
+    def counts(self, rows):
+        """Apariciones por id para las filas seleccionadas"""
+        return np.bincount(self.select(rows), minlength=len(self.names))
+
+    def nunique(self, rows):
+        return int(np.count_nonzero(self.counts(rows)))
+
+
+def _expand_members(codes, ptr, member_ids):
+    """Filas y miembros de un puente a partir de listas por código (formato CSR).
+
+    Los miembros del código ``c`` son ``member_ids[ptr[c]:ptr[c + 1]]``.
+    """
+    lengths = ptr[codes + 1] - ptr[codes]
+    row_ids = np.repeat(np.arange(len(codes)), lengths).astype(np.int32)
+    starts = np.repeat(ptr[codes] - (np.cumsum(lengths) - lengths), lengths)
+    return row_ids, member_ids[starts + np.arange(len(row_ids))]
+
+
+def _names_array(names):
+    array = np.empty(len(names), dtype=object)
+    array[:] = names
+    return array
+
+
+class SearchIndex:
+    """Índice invertido de textos normalizados: palabra -> códigos que la contienen.
+
+    Las palabras quedan ordenadas, así que las que empiezan con lo buscado son
+    un tramo contiguo que se encuentra con búsqueda binaria. Se arma la primera
+    vez que se busca y lo comparten todos los países del mismo snapshot.
+    """
+
+    def __init__(self, texts):
+        self.texts = texts  # pd.Series con el texto normalizado de cada código
+
+    @cached_property
+    def _postings(self):
+        words = self.texts.str.findall(r'\w+').explode().dropna()
+        postings = pd.DataFrame({'word': words.to_numpy(dtype=object), 'code': words.index.to_numpy()})
+        postings = postings.drop_duplicates().sort_values(['word', 'code'], ignore_index=True)
+        words, starts = np.unique(postings['word'].to_numpy(dtype=object), return_index=True)
+        return words, np.append(starts, len(postings)), postings['code'].to_numpy(dtype=np.int32)
+
+    def matches(self, word):
+        """Máscara por código: textos con alguna palabra que empieza con ``word``"""
+        words, ptr, codes = self._postings
+        first, last = np.searchsorted(words, [word, word + '\U0010ffff'])
+        mask = np.zeros(len(self.texts), dtype=bool)
+        mask[codes[ptr[first]:ptr[last]]] = True
+        return mask
+
+
+@dataclass
+class MemberLists:
+    """Textos distintos de una columna con varios miembros ('Artist' o 'Label').
+
+    Cada fila de un país guarda el código de su texto, así que artistas y
+    labels son los de esa fila aunque la misma canción cambie de label.
+    """
+    texts: np.ndarray    # texto original de cada código (None si faltaba)
+    search: SearchIndex  # textos normalizados de cada código, para el buscador
+    ptr: np.ndarray      # int64, miembros de cada código (CSR)
+    ids: np.ndarray      # int32, id de artista o label
+
+
+class _MemberListIndex:
+    """Parte mutable de ``MemberLists``; los ids de miembro se comparten con ``names_index``"""
+
+    def __init__(self, separator, names_index):
+        self.separator = separator
+        self.names_index = names_index
+        self.index = {}
+        self.texts, self.search = [], []
+        self.ptr, self.ids = [0], []
+
+    def encode(self, values):
+        """Código de cada texto (agregando los nuevos) y si hubo alguno nuevo"""
+        codes = np.empty(len(values), dtype=np.int32)
+        added = False
+        for position, value in enumerate(values):
+            text = value if isinstance(value, str) else None
+            code = self.index.get(text)
+            if code is None:
+                code = self.index[text] = len(self.texts)
+                self.texts.append(text)
+                self.search.append(normalize_text(text) if text else "")
+                for name in text.split(self.separator) if text else ():
+                    self.ids.append(self.names_index.setdefault(name.strip(), len(self.names_index)))
+                self.ptr.append(len(self.ids))
+                added = True
+            codes[position] = code
+        return codes, added
+
+    def snapshot(self):
+        return MemberLists(
+            texts=_names_array(self.texts),
+            search=SearchIndex(pd.Series(self.search, dtype=object)),
+            ptr=np.asarray(self.ptr, dtype=np.int64),
+            ids=np.asarray(self.ids, dtype=np.int32),
+        )
+
+
+@dataclass
+class DimensionSnapshot:
+    """Estado inmutable de las dimensiones en un momento dado.
+
+    Los ids nunca cambian, así que los datos construidos con un snapshot
+    siguen siendo válidos aunque las dimensiones crezcan después.
+    """
+    tracks: pd.DataFrame         # una fila por URI con 'uri', 'Track Name', 'Artist', 'Label' y 'search'
+    track_search: SearchIndex    # sobre el nombre normalizado de cada canción
+    artist_names: np.ndarray
+    label_names: np.ndarray
+    artist_lists: MemberLists
+    label_lists: MemberLists
+
+
+@dataclass
+class EncodedRows:
+    """Ids de canción y códigos de artistas y labels de cada fila"""
+    track_ids: np.ndarray     # int32
+    artist_codes: np.ndarray  # int32, código en ``snapshot.artist_lists``
+    label_codes: np.ndarray   # int32, código en ``snapshot.label_lists``
+    snapshot: DimensionSnapshot
+
+
+class Dimensions:
+    """Canciones (por URI), artistas y labels compartidos por todos los países.
+
+    La tabla de canciones identifica cada URI y guarda los textos de la
+    primera fila en que apareció, solo para mostrarla. Los artistas y labels
+    se toman del texto de cada fila (separado una sola vez por texto
+    distinto), así que un cambio de label de la misma canción se respeta.
+    Los países guardan solo ids y códigos enteros; ``encode`` es seguro entre
+    hilos.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.track_index = {}
+        self.track_columns = {'uri': [], 'Track Name': [], 'Artist': [], 'Label': [], 'search': []}
+        self.artist_index = {}
+        self.label_index = {}
+        self.artist_lists = _MemberListIndex(ARTIST_SEPARATOR, self.artist_index)
+        self.label_lists = _MemberListIndex(LABEL_SEPARATOR, self.label_index)
+        self.snapshot = self._snapshot()
+
+    def _snapshot(self):
+        tracks = pd.DataFrame(self.track_columns)
+        return DimensionSnapshot(
+            tracks=tracks,
+            track_search=SearchIndex(tracks['search']),
+            artist_names=_names_array(list(self.artist_index)),
+            label_names=_names_array(list(self.label_index)),
+            artist_lists=self.artist_lists.snapshot(),
+            label_lists=self.label_lists.snapshot(),
+        )
+
+    def encode(self, df):
+        """Codificar las filas (agregando canciones y textos nuevos); devuelve ``EncodedRows``"""
+        keys = track_keys(df)
+        codes, uniques = pd.factorize(keys)
+        first_rows = np.unique(codes, return_index=True)[1]
+        # Textos de la primera fila de cada canción, leídos una sola vez
+        first_values = {column: df[column].take(first_rows).tolist()
+                        for column in ('Track Name', 'Artist', 'Label')}
+        # Cada texto distinto de artistas y labels se separa una sola vez
+        artist_codes, artist_texts = pd.factorize(df['Artist'], use_na_sentinel=False)
+        label_codes, label_texts = pd.factorize(df['Label'], use_na_sentinel=False)
+        with self.lock:
+            unique_ids = np.empty(len(uniques), dtype=np.int32)
+            added = False
+            for code, key in enumerate(uniques):
+                track_id = self.track_index.get(key)
+                if track_id is None:
+                    track_id = self.track_index[key] = len(self.track_index)
+                    self.track_columns['uri'].append(key)
+                    for column, values in first_values.items():
+                        self.track_columns[column].append(values[code])
+                    # Índice de búsqueda: nombre normalizado una sola vez
+                    self.track_columns['search'].append(normalize_text(str(first_values['Track Name'][code])))
+                    added = True
+                unique_ids[code] = track_id
+            artist_ids, added_artists = self.artist_lists.encode(artist_texts.tolist())
+            label_ids, added_labels = self.label_lists.encode(label_texts.tolist())
+            if added or added_artists or added_labels:
+                self.snapshot = self._snapshot()
+            return EncodedRows(unique_ids[codes], artist_ids[artist_codes], label_ids[label_codes],
+                               self.snapshot)
+
+
+def normalize_text(text):
+    """Minúsculas y sin acentos (para que "cancion" encuentre "Canción")"""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def search_words(query):
+    """Palabras de una búsqueda, normalizadas como los textos del índice"""
+    return re.findall(r'\w+', normalize_text(query))
+
+
+def track_keys(df):
+    """URI de cada fila; si falta, una clave por nombre y artistas"""
+    if 'uri' in df and not df['uri'].isna().any():
+        return df['uri']
+    fallback = "name:" + df['Track Name'].astype(str) + " - " + df['Artist'].astype(str)
+    return df['uri'].fillna(fallback) if 'uri' in df else fallback
+
+
+@dataclass
+class ChartData:
+    """Tabla de hechos de un país (fecha, posición, streams e id de canción).
+
+    Los textos viven en las dimensiones compartidas: ``tracks`` y los nombres
+    de los puentes son los del snapshot con el que se construyeron los datos.
+    """
+    df: pd.DataFrame        # 'date', 'Position' y 'Streams'
+    artists: Bridge
+    labels: Bridge
+    track_ids: np.ndarray   # int32, id global de la canción de cada fila
+    tracks: pd.DataFrame    # una fila por canción con 'uri', 'Track Name', 'Artist', 'Label' y 'search'
+    track_search: SearchIndex
+    index: DateIndex
+
+    def select(self, start_date, end_date, min_position=1, max_position=POSITION_STRIDE - 1):
+        """Filas del rango de fechas y posiciones (ver ``DateIndex.select``)"""
+        return self.index.select(start_date, end_date, min_position, max_position)
+
+    def column(self, name, row_ids):
+        """Valores de una columna de hechos, de artistas o labels, o de la canción para las filas indicadas"""
+        if name in self.df:
+            return self.df[name].to_numpy()[row_ids]
+        if name in ROW_TEXT_COLUMNS:
+            bridge = getattr(self, ROW_TEXT_COLUMNS[name])
+            return bridge.lists.texts[bridge.row_codes[row_ids]]
+        return self.tracks[name].to_numpy()[self.track_ids[row_ids]]
+
+    def frame(self, rows, columns):
+        """DataFrame de las filas seleccionadas con columnas de hechos y de canción"""
+        row_ids = rows.indices()
+        return pd.DataFrame({name: self.column(name, row_ids) for name in columns})
+
+    def search(self, rows, query):
+        """Filas de la selección cuya canción, artistas o labels coinciden con la búsqueda.
+
+        Cada palabra buscada tiene que ser el comienzo de alguna palabra del
+        nombre, los artistas o los labels de la fila.
+        """
+        words = search_words(query)
+        if not words:
+            return rows
+        row_ids = rows.indices()
+        track_ids = self.track_ids[row_ids]
+        artist_codes = self.artists.row_codes[row_ids]
+        label_codes = self.labels.row_codes[row_ids]
+        matches = np.ones(len(row_ids), dtype=bool)
+        for word in words:
+            matches &= (self.track_search.matches(word)[track_ids]
+                        | self.artists.lists.search.matches(word)[artist_codes]
+                        | self.labels.lists.search.matches(word)[label_codes])
+        row_ids = row_ids[matches]
+        return RowRanges(row_ids, row_ids + 1)
+
+
+FACT_COLUMNS = ['date', 'Position', 'Streams']
+# Columnas de texto que se leen de la fila (vía su puente) y no de la canción
+ROW_TEXT_COLUMNS = {'Artist': 'artists', 'Label': 'labels'}
+
+
+def _prepare_rows(df):
+    df = df.dropna(subset=['Position'])
+    return df.sort_values(['date', 'Position'], kind='stable', ignore_index=True)
+
+
+def _bridge(names, row_codes, lists, first_row=0, previous=None):
+    """Puente de las filas a partir del código de texto de cada una.
+
+    Con ``previous`` (el puente de las filas anteriores a ``first_row``) se
+    agregan las filas nuevas al final.
+    """
+    row_ids, ids = _expand_members(row_codes, lists.ptr, lists.ids)
+    if previous is not None:
+        row_ids = np.concatenate([previous.row_ids, row_ids + first_row])
+        ids = np.concatenate([previous.ids, ids])
+        row_codes = np.concatenate([previous.row_codes, row_codes])
+    return Bridge(names=names, row_ids=row_ids, ids=ids, row_codes=row_codes, lists=lists)
+
+
+def build_chart_data(df, dimensions=None):
+    """Codificar las filas de un país contra las dimensiones compartidas"""
+    dimensions = dimensions or Dimensions()
+    df = _prepare_rows(df)
+    encoded = dimensions.encode(df)
+    snapshot = encoded.snapshot
+    return ChartData(
+        df=df[FACT_COLUMNS],
+        artists=_bridge(snapshot.artist_names, encoded.artist_codes, snapshot.artist_lists),
+        labels=_bridge(snapshot.label_names, encoded.label_codes, snapshot.label_lists),
+        track_ids=encoded.track_ids,
+        tracks=snapshot.tracks,
+        track_search=snapshot.track_search,
+        index=DateIndex.build(df['date'].to_numpy(), df['Position'].to_numpy(dtype=np.int64)),
+    )
+
+
+def append_chart_data(data, new_df, dimensions):
+    """Agregar fechas posteriores a las ya cargadas sin reconstruir lo existente.
+
+    Devuelve un ``ChartData`` nuevo (el original no se modifica, así que puede
+    seguir en uso mientras tanto). Las fechas de ``new_df`` deben ser todas
+    posteriores a la última fecha de ``data``, y ``dimensions`` debe ser la
+    misma con la que se construyó ``data``.
+    """
+    new_df = _prepare_rows(new_df)
+    first_row = len(data.df)
+    encoded = dimensions.encode(new_df)
+    snapshot = encoded.snapshot
+    return ChartData(
+        df=pd.concat([data.df, new_df[FACT_COLUMNS]], ignore_index=True),
+        artists=_bridge(snapshot.artist_names, encoded.artist_codes, snapshot.artist_lists,
+                        first_row, data.artists),
+        labels=_bridge(snapshot.label_names, encoded.label_codes, snapshot.label_lists,
+                       first_row, data.labels),
+        track_ids=np.concatenate([data.track_ids, encoded.track_ids]),
+        tracks=snapshot.tracks,
+        track_search=snapshot.track_search,
+        index=data.index.extend(new_df['date'].to_numpy(), new_df['Position'].to_numpy(dtype=np.int64)),
+    )
+
+
+def top_ids(counts, n=None):
+    """Ids con conteo positivo ordenados de mayor a menor conteo"""
+    nonzero = np.flatnonzero(counts)
+    order = nonzero[np.argsort(-counts[nonzero], kind='stable')]
+    if n is not None:
+        order = order[:n]
+    return order
+
+
+def top_counts(counts, names, n=None):
+    """Convertir conteos por id en una Serie ordenada como value_counts"""
+    order = top_ids(counts, n)
+    return pd.Series(counts[order], index=pd.Index(names[order], name=None))
+
+
+def expand_dimension(data, bridge, rows, column, columns=('date', 'Position')):
+    """Marco largo (una fila por miembro) solo para las filas seleccionadas.
+
+    Reemplaza al antiguo DataFrame explotado cuando se necesita una vista por
+    artista o label; la columna de nombres es categórica.
+    """
+    links = rows.map(bridge.row_ids)
+    row_ids = links.take(bridge.row_ids)
+    ids = links.take(bridge.ids)
+    expanded = {name: data.column(name, row_ids) for name in columns}
+    expanded[column] = pd.Categorical.from_codes(ids, categories=pd.Index(bridge.names))
+    return pd.DataFrame(expanded)
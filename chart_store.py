@@ -0,0 +1,169 @@
+"""Datos del dashboard que se actualizan solos cuando el bot descarga fechas nuevas.
+
+Una sola instancia se comparte entre todas las sesiones de Streamlit. En cada
+consulta se compara el manifiesto de CSV del país (nombre y mtime) con el de la
+última carga: si aparecieron fechas posteriores solo se leen esas fechas y se
+agregan a los datos, puentes y cubos ya construidos; una fecha reescrita,
+quitada o anterior a las cargadas obliga a reconstruir el país desde el
+almacén columnar.
+
+Cada país se carga recién cuando se pide y los menos usados se descartan al
+superar ``max_countries``, de modo que el arranque y la memoria dependen del
+país seleccionado y no de todos. Una comparación fija sus países
+(``pinned``) para que no se descarten mientras dura, aunque sean más.
+"""
+import itertools
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from chart_data import ChartData, Dimensions, append_chart_data, build_chart_data
+from rollups import ChartRollups, append_rollups, build_rollups
+from storage import DOWNLOADS_DIR, STORE_DIR, compact_country, load_country, source_manifest
+
+# Países que se mantienen en memoria a la vez (menos que los disponibles: la
+# precarga se detiene al llegar a este límite; solo una comparación lo supera
+# mientras dura)
+MAX_COUNTRIES = 3
+
+
+@dataclass
+class CountryData:
+    """Datos cargados de un país y el manifiesto de CSV del que salieron"""
+    data: ChartData
+    rollups: ChartRollups
+    manifest: dict
+    version: int    # distinta en cada actualización (única en todo el ChartStore)
+
+
+class ChartStore:
+    """Datos por país con actualización incremental según los CSV en disco"""
+
+    def __init__(self, downloads_dir=DOWNLOADS_DIR, store_dir=STORE_DIR, max_countries=MAX_COUNTRIES):
+        self.downloads_dir = downloads_dir
+        self.store_dir = store_dir
+        self.max_countries = max_countries
+        # Canciones, artistas y labels compartidos: los ids son comparables entre países
+        self.dimensions = Dimensions()
+        self.countries = OrderedDict()  # del menos al más usado
+        self.pins = {}                  # código -> comparaciones en curso que lo fijaron
+        self.locks = {}
+        self.lock = threading.Lock()
+        self.warm_thread = None
+        # Un país descartado y vuelto a cargar no repite versión: sirve de clave de caché
+        self.versions = itertools.count(1)
+
+    def _country_lock(self, country_code):
+        with self.lock:
+            return self.locks.setdefault(country_code, threading.Lock())
+
+    def _cached(self, country_code):
+        with self.lock:
+            current = self.countries.get(country_code)
+            if current is not None:
+                self.countries.move_to_end(country_code)
+            return current
+
+    def _evict(self):
+        # Con self.lock tomado: descartar los menos usados que no estén fijados
+        for country_code in [code for code in self.countries if code not in self.pins]:
+            if len(self.countries) <= self.max_countries:
+                break
+            del self.countries[country_code]
+
+    def _store(self, country_code, country):
+        with self.lock:
+            self.countries[country_code] = country
+            self.countries.move_to_end(country_code)
+            self._evict()
+
+    @contextmanager
+    def pinned(self, country_codes):
+        """No descartar los países indicados mientras dure el bloque.
+
+        Pueden superar ``max_countries``; al salir se vuelve al límite.
+        """
+        country_codes = list(country_codes)
+        with self.lock:
+            for country_code in country_codes:
+                self.pins[country_code] = self.pins.get(country_code, 0) + 1
+        try:
+            yield self
+        finally:
+            with self.lock:
+                for country_code in country_codes:
+                    self.pins[country_code] -= 1
+                    if not self.pins[country_code]:
+                        del self.pins[country_code]
+                self._evict()
+
+    def loaded(self):
+        """Códigos de los países en memoria"""
+        with self.lock:
+            return list(self.countries)
+
+    def get(self, country_code):
+        """Datos actualizados del país (None si no hay CSV válidos)"""
+        manifest = source_manifest(country_code, self.downloads_dir)
+        current = self._cached(country_code)
+        if current is not None and current.manifest == manifest:
+            return current
+        # Una sola sesión actualiza el país; las demás esperan y reutilizan el resultado
+        with self._country_lock(country_code):
+            current = self._cached(country_code)
+            if current is not None and current.manifest == manifest:
+                return current
+            updated = self._update(country_code, current, manifest)
+            if updated is not None:
+                self._store(country_code, updated)
+            return updated
+
+    def warm(self, country_codes):
+        """Cargar en segundo plano los países indicados mientras haya lugar.
+
+        No descarta países ya cargados para hacer lugar, y solo corre una
+        precarga a la vez.
+        """
+        with self.lock:
+            if self.warm_thread is not None and self.warm_thread.is_alive():
+                return
+            self.warm_thread = threading.Thread(target=self._warm, args=(list(country_codes),),
+                                                daemon=True)
+            self.warm_thread.start()
+
+    def _warm(self, country_codes):
+        for country_code in country_codes:
+            with self.lock:
+                if country_code in self.countries:
+                    continue
+                if len(self.countries) >= self.max_countries:
+                    return
+            try:
+                self.get(country_code)
+            except Exception as e:
+                print(f"No se pudo precargar {country_code}: {e}")
+
+    def _update(self, country_code, current, manifest):
+        updated = compact_country(country_code, self.downloads_dir, self.store_dir)
+        version = next(self.versions)
+
+        if current is not None and not updated:
+            return CountryData(current.data, current.rollups, manifest, current.version)
+
+        if (current is None or current.data.df.empty
+                or min(updated) <= current.data.df['date'].iloc[-1].strftime('%Y-%m-%d')):
+            # Primera carga, fechas reescritas, quitadas o anteriores: reconstruir
+            df = load_country(country_code, self.store_dir)
+            if df is None:
+                return None
+            data = build_chart_data(df, self.dimensions)
+            return CountryData(data, build_rollups(data), manifest, version)
+
+        new_df = load_country(country_code, self.store_dir, dates=updated)
+        if new_df is None or new_df.empty:
+            return CountryData(current.data, current.rollups, manifest, current.version)
+        first_row = len(current.data.df)
+        data = append_chart_data(current.data, new_df, self.dimensions)
+        rollups = append_rollups(current.rollups, data, first_row)
+        return CountryData(data, rollups, manifest, version)
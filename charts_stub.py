@@ -0,0 +1,145 @@
+"""Servidor local que imita el servicio de charts para probar el bot.
+
+Sirve CSV diarios falsos en ``/charts/regional-<pais>-daily/<fecha>`` con las
+mismas columnas que el botón de descarga de Spotify Charts. Con
+``--require-cookie`` responde 401 si el pedido no trae esa cookie, lo que
+permite probar el paso al navegador ante errores de autenticación.
+
+En ``/charts/view/regional-<pais>-daily/<fecha>`` sirve una página que dibuja
+el mismo botón ``csv_download`` por JavaScript y pide fuentes, imágenes y un
+script de analytics lentos (``--asset-delay``), para medir el bot con
+``python bot.py ar --benchmark 20 --chart-url http://127.0.0.1:8765/charts/view/{chart}/{date}``.
+
+Uso:
+    python charts_stub.py --port 8765 --require-cookie sp_dc
+"""
+import argparse
+import csv
+import io
+import random
+import re
+import time
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from manifest import CSV_COLUMNS
+
+CHART_PATH = re.compile(r"^/charts/regional-([a-z]{2})-daily/(\d{4}-\d{2}-\d{2})$")
+VIEW_PATH = re.compile(r"^/charts/view/regional-([a-z]{2})-daily/(\d{4}-\d{2}-\d{2})$")
+ASSET_PATH = re.compile(r"^/assets/[\w.-]+$")
+
+# Página de una fecha: el botón aparece después de renderizar, como en la aplicación real
+VIEW_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<link rel="preload" href="/assets/circular.woff2" as="font" type="font/woff2" crossorigin>
+<style>@font-face {{ font-family: Circular; src: url(/assets/circular.woff2); }} body {{ font-family: Circular; }}</style>
+<script async src="/assets/analytics.js?tid=googletagmanager.com"></script>
+</head>
+<body>
+<span id="csv_download">Descargar CSV</span>
+<div id="app">{covers}</div>
+<script>
+setTimeout(function () {{
+    var button = document.createElement("button");
+    button.setAttribute("data-encore-id", "buttonTertiary");
+    button.setAttribute("aria-labelledby", "csv_download");
+    button.textContent = "CSV";
+    button.onclick = function () {{
+        var link = document.createElement("a");
+        link.href = "/charts/regional-{country}-daily/{date}";
+        link.download = "regional-{country}-daily-{date}.csv";
+        document.body.appendChild(link);
+        link.click();
+    }};
+    document.getElementById("app").appendChild(button);
+}}, {render_delay});
+</script>
+</body>
+</html>
+"""
+
+
+def fake_chart_csv(country_code, date, rows=200):
+    """CSV de un día con filas deterministas para el país y la fecha"""
+    rng = random.Random(f"{country_code}-{date}")
+    output = io.StringIO()
+    # Mismo formato que el botón: encabezado sin comillas y textos entre comillas
+    output.write(",".join(CSV_COLUMNS) + "\n")
+    writer = csv.writer(output, quoting=csv.QUOTE_NONNUMERIC, lineterminator="\n")
+    streams = rng.randint(300_000, 600_000)
+    for rank in range(1, rows + 1):
+        track = rng.randint(1, 400)
+        artists = ", ".join(f"Artista {rng.randint(1, 150)}" for _ in range(rng.choice([1, 1, 1, 2, 3])))
+        labels = " / ".join(f"Label {rng.randint(1, 40)}" for _ in range(rng.choice([1, 1, 2])))
+        writer.writerow([rank, f"spotify:track:{country_code}{track:020d}", artists,
+                         f"Canción {track}", labels, rng.randint(1, rank), rng.randint(1, 200),
+                         rng.randint(1, 500), str(streams)])
+        streams = int(streams * rng.uniform(0.95, 0.999))
+    return output.getvalue().encode('utf-8')
+
+
+def view_page(country_code, date, covers=12, render_delay=150):
+    """HTML de la página de una fecha con portadas y el botón de descarga"""
+    cover_tags = "".join(f'<img src="/assets/cover-{date}-{i}.jpg" width="64">' for i in range(covers))
+    return VIEW_PAGE.format(country=country_code, date=date, covers=cover_tags,
+                            render_delay=render_delay).encode('utf-8')
+
+
+class ChartsHandler(BaseHTTPRequestHandler):
+    require_cookie = None
+    asset_delay = 0.5
+
+    def do_GET(self):
+        view = VIEW_PATH.match(self.path)
+        if view:
+            return self._send(view_page(*view.groups()), 'text/html; charset=utf-8')
+        if ASSET_PATH.match(self.path.split('?')[0]):
+            # Fuentes, imágenes y analytics lentos: el perfil optimizado no los espera
+            time.sleep(self.asset_delay)
+            return self._send(b"", 'application/octet-stream')
+        match = CHART_PATH.match(self.path)
+        if not match:
+            self.send_error(404)
+            return
+        if self.require_cookie:
+            cookies = SimpleCookie(self.headers.get('Cookie', ''))
+            if self.require_cookie not in cookies:
+                self.send_error(401)
+                return
+        self._send(fake_chart_csv(*match.groups()), 'text/csv; charset=utf-8')
+
+    def _send(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host="127.0.0.1", port=8765, require_cookie=None, asset_delay=0.5):
+    handler = type('Handler', (ChartsHandler,), {'require_cookie': require_cookie,
+                                                 'asset_delay': asset_delay})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local de charts falsos")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--require-cookie", default=None,
+                        help="Responder 401 si falta esta cookie")
+    parser.add_argument("--asset-delay", type=float, default=0.5,
+                        help="Segundos que tarda cada fuente, imagen o script de la página")
+    args = parser.parse_args()
+    server = make_server(args.host, args.port, args.require_cookie, args.asset_delay)
+    print(f"Sirviendo charts falsos en http://{args.host}:{args.port}/charts/<chart>/<fecha>")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
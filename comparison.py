@@ -0,0 +1,80 @@
+"""Comparación de varios países con los mismos filtros.
+
+Cada país se carga y se agrega en su propio hilo: la lectura de Parquet y las
+operaciones de numpy y pandas liberan el GIL, y los datos quedan compartidos
+en memoria (``ChartStore``) sin copiarse a otro proceso, así que comparar
+varios países tarda aproximadamente lo que tarda el más lento y no la suma.
+Los agregados pasan por la misma ``ResultCache`` que el dashboard y
+``queries.py``.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from analytics import member_position_pivot
+
+# Hilos a la vez; cada país usa uno
+MAX_WORKERS = 4
+
+# Agregados que se comparan: nombre -> métrica de ``queries.METRICS``
+COMPARED_METRICS = {
+    'summary': 'summary',
+    'number_ones': 'number-one-artists',
+    'top_artists': 'top-artists',
+    'streams': 'streams-by-month',
+}
+
+
+def run_parallel(function, country_codes, workers=MAX_WORKERS):
+    """Aplicar ``function`` a cada país en un pool de hilos; devuelve código -> resultado"""
+    country_codes = list(country_codes)
+    if not country_codes:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(workers, len(country_codes))) as pool:
+        return dict(zip(country_codes, pool.map(function, country_codes)))
+
+
+def load_countries(store, country_codes, workers=MAX_WORKERS):
+    """Cargar (o actualizar) varios países a la vez; sin datos quedan en None"""
+    return run_parallel(store.get, country_codes, workers)
+
+
+def compare_countries(engine, country_codes, start_date, end_date, positions, limit=10,
+                      workers=MAX_WORKERS):
+    """Los agregados de ``COMPARED_METRICS`` de cada país, calculados en paralelo.
+
+    Devuelve código -> {nombre: DataFrame}, o None si el país no tiene datos
+    en el rango.
+    """
+    def aggregates(country_code):
+        try:
+            return {name: engine.query(metric, country_code, start_date, end_date, positions, limit)
+                    for name, metric in COMPARED_METRICS.items()}
+        except ValueError:
+            return None
+    return run_parallel(aggregates, country_codes, workers)
+
+
+def artist_positions(engine, country_codes, artist_id, start_date, end_date, min_position, max_position,
+                     workers=MAX_WORKERS):
+    """Mejor posición diaria de un artista en cada país (fechas x países).
+
+    Los ids de artista son los mismos en todos los países. Las fechas sin el
+    artista en el chart de un país quedan vacías.
+    """
+    def positions(country_code):
+        country = engine.store.get(country_code)
+        if country is None:
+            return None
+        key = (country_code, country.version, 'artist-positions', start_date, end_date,
+               min_position, max_position, artist_id)
+        return engine.cache.get_or_compute(key, lambda: member_position_pivot(
+            country.data, country.data.artists,
+            country.data.select(start_date, end_date, min_position, max_position), [artist_id]
+        )[artist_id])
+
+    by_country = {code: series for code, series in run_parallel(positions, country_codes, workers).items()
+                  if series is not None and series.notna().any()}
+    if not by_country:
+        return pd.DataFrame()
+    return pd.DataFrame(by_country).sort_index()
@@ -1,11 +1,22 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-import glob
 import os
+import time
 from datetime import datetime
 
+from analytics import MAX_PLOT_POINTS, adaptive_pivot, capped_long, member_position_pivot, track_presence
+from chart_data import expand_dimension, top_counts, top_ids
+from chart_store import ChartStore
+from comparison import artist_positions, compare_countries, load_countries
+from instrumentation import Recorder
+from queries import QueryEngine
+from result_cache import ResultCache
+from rollups import query
+from streaks import longest_streaks
+
 # Configuración de la página
 st.set_page_config(
     page_title="Spotify Charts Dashboard",
@@ -13,6 +24,144 @@ st.set_page_config(
     layout="wide"
 )
 
+# Tiempos por etapa de esta ejecución; con DASHBOARD_METRICS_FILE (.jsonl o .prom) se guardan
+METRICS_FILE = os.environ.get("DASHBOARD_METRICS_FILE")
+recorder = Recorder("dashboard")
+run_started = time.perf_counter()
+
+# Filas por página de la tabla de datos detallados
+PAGE_SIZE = 100
+DETAIL_COLUMNS = ['date', 'Position', 'Track Name', 'Artist', 'Label', 'Streams']
+
+# Resoluciones del gráfico de evolución (la automática respeta MAX_PLOT_POINTS)
+RESOLUTIONS = {None: "Automática", 'day': "Diaria", 'week': "Semanal", 'month': "Mensual"}
+DATE_FORMATS = {'day': '%d/%m/%Y', 'week': '%d/%m/%Y', 'month': '%m/%Y'}
+
+STREAK_KINDS = {'tracks': "Canciones", 'artists': "Artistas", 'labels': "Discográficas"}
+STREAK_COLUMNS = {'name': 'Nombre', 'days': 'Días seguidos', 'start_date': 'Desde',
+                  'end_date': 'Hasta', 'missing_days': 'Días sin datos'}
+
+def show_streaks(streaks):
+    st.dataframe(streaks[list(STREAK_COLUMNS)].rename(columns=STREAK_COLUMNS),
+                 use_container_width=True, hide_index=True)
+
+COMPARISON_LIMIT = 10
+
+def show_comparison(country_codes):
+    """Los mismos agregados para varios países, calculados en paralelo"""
+    if not country_codes:
+        st.info("Elegí al menos un país para comparar")
+        return
+    names = ", ".join(country_options[code] for code in country_codes)
+    # Todos los países se cargan a la vez, cada uno en su hilo
+    with recorder.time("load"), st.spinner(f"Cargando datos de {names}..."):
+        loaded = {code: country for code, country in load_countries(store, country_codes).items()
+                  if country is not None}
+    missing = [country_options[code] for code in country_codes if code not in loaded]
+    if missing:
+        st.warning(f"No se encontraron archivos CSV válidos para: {', '.join(missing)}")
+    if not loaded:
+        return
+
+    st.sidebar.header("Filtros")
+    min_date = min(country.data.df['date'].min() for country in loaded.values())
+    max_date = max(country.data.df['date'].max() for country in loaded.values())
+    start_date = st.sidebar.date_input("Fecha de inicio", min_date, min_value=min_date, max_value=max_date,
+                                       key="compare_start")
+    end_date = st.sidebar.date_input("Fecha de fin", max_date, min_value=min_date, max_value=max_date,
+                                     key="compare_end")
+    min_position = st.sidebar.slider("Posición mínima", min_value=1, max_value=200, value=1,
+                                     key="compare_min_position")
+    max_position = st.sidebar.slider("Posición máxima", min_value=1, max_value=200, value=50,
+                                     key="compare_max_position")
+
+    engine = QueryEngine(store, results)
+    with recorder.time("comparison"):
+        by_country = compare_countries(engine, list(loaded), start_date, end_date,
+                                       (min_position, max_position), COMPARISON_LIMIT)
+    by_country = {code: aggregates for code, aggregates in by_country.items() if aggregates is not None}
+    if not by_country:
+        st.warning("No hay datos en el período elegido")
+        return
+
+    def combined(name):
+        return pd.concat([aggregates[name].assign(País=country_options[code])
+                          for code, aggregates in by_country.items()], ignore_index=True)
+
+    st.header("🌎 Comparación de Países")
+    summary = combined('summary')
+    st.dataframe(summary[['País', 'tracks', 'artists', 'labels', 'streams']].rename(columns={
+        'tracks': 'Canciones únicas', 'artists': 'Artistas únicos', 'labels': 'Labels', 'streams': 'Streams'
+    }), use_container_width=True, hide_index=True)
+
+    # Días en el #1, superpuestos: los artistas con más días sumando todos los países
+    st.subheader("Artistas con Más Días en el #1")
+    number_ones = combined('number_ones')
+    leaders = number_ones.groupby('name')['days'].sum().nlargest(COMPARISON_LIMIT).index
+    number_ones = number_ones[number_ones['name'].isin(leaders)]
+    fig_days = px.bar(number_ones, x='name', y='days', color='País', barmode='group',
+                      category_orders={'name': list(leaders)},
+                      title="Días en el #1 por país", labels={'name': 'Artista', 'days': 'Días'})
+    plot_chart(fig_days)
+
+    # Top de artistas de cada país, lado a lado
+    st.subheader("Top 10 Artistas por Apariciones")
+    for column, (code, aggregates) in zip(st.columns(len(by_country)), by_country.items()):
+        with column:
+            st.markdown(f"**{country_options[code]}**")
+            st.dataframe(aggregates['top_artists'][['name', 'appearances']].rename(columns={
+                'name': 'Artista', 'appearances': 'Apariciones'
+            }), use_container_width=True, hide_index=True)
+
+    st.subheader("Streams por Mes")
+    fig_streams = px.line(combined('streams'), x='month', y='streams', color='País',
+                          labels={'month': 'Mes', 'streams': 'Streams'}, render_mode='webgl')
+    plot_chart(fig_streams)
+
+    # Los artistas tienen el mismo id en todos los países
+    st.subheader("Posición de un Artista en Cada País")
+    artist_names = list(dict.fromkeys(combined('top_artists')['name']))
+    if not artist_names:
+        return
+    artist_name = st.selectbox("Artista", options=artist_names)
+    artist_id = store.dimensions.artist_index[artist_name]
+    with recorder.time("comparison"):
+        pivot = artist_positions(engine, list(by_country), artist_id, start_date, end_date,
+                                 min_position, max_position)
+    if pivot.empty:
+        st.info(f"{artist_name} no entró al chart en el período elegido")
+        return
+    resolution, pivot = adaptive_pivot(pivot, MAX_PLOT_POINTS)
+    df_positions = capped_long(pivot, 'Fecha', 'País', 'Posición',
+                               key_names=[country_options[code] for code in pivot.columns],
+                               max_points=MAX_PLOT_POINTS)
+    fig_positions = px.line(df_positions, x='Fecha', y='Posición', color='País',
+                            title=f"Mejor posición de {artist_name}", render_mode='webgl')
+    fig_positions.update_yaxes(autorange="reversed")
+    fig_positions.update_layout(xaxis=dict(tickformat=DATE_FORMATS[resolution], tickangle=45))
+    plot_chart(fig_positions)
+
+def finish_run(country_label):
+    # Precargar en segundo plano los demás países una vez mostrada la página
+    store.warm(list(country_options))
+
+    # Desglose de tiempos de esta ejecución
+    recorder.observe("total", time.perf_counter() - run_started)
+    if METRICS_FILE:
+        recorder.write(METRICS_FILE, country=country_label)
+    if st.sidebar.checkbox("Mostrar tiempos (debug)"):
+        timings = pd.DataFrame.from_dict(recorder.summary(), orient='index')
+        st.sidebar.dataframe(timings[['calls', 'seconds']].style.format({'seconds': '{:.3f}'}))
+        st.sidebar.caption(", ".join(f"{name}: {value:,}" for name, value in recorder.counters.items()))
+        cache_stats = results.stats()
+        st.sidebar.caption(f"Caché compartida: {cache_stats['entries']:,} resultados, "
+                           f"{cache_stats['bytes'] / 1024 ** 2:.1f} MB")
+
+def plot_chart(fig):
+    # Incluye la serialización de la figura a JSON
+    with recorder.time("plotly"):
+        st.plotly_chart(fig, use_container_width=True)
+
 # Título y descripción
 st.title("🎵 Spotify Charts Dashboard")
 st.markdown("""
@@ -32,103 +181,59 @@ if not os.path.exists("spotify_downloads"):
     """)
     st.stop()
 
-# Cargar todos los archivos CSV
-@st.cache_data
-def load_data():
-    countries = {
-        'ar': 'Argentina',
-        'cl': 'Chile',
-        'uy': 'Uruguay',
-        'mx': 'México',
-        'es': 'España'
-    }
-    
-    all_dfs = {}
-    all_artists_expanded = {}
-    all_labels_expanded = {}
-    
-    for country_code in countries:
-        all_files = glob.glob(f"spotify_downloads/{country_code}/*.csv")
-        dfs = []
-        
-        for file in all_files:
-            try:
-                # Leer el CSV
-                df = pd.read_csv(file)
-                
-                # Renombrar columnas si es necesario
-                column_mapping = {
-                    'rank': 'Position',
-                    'artist_names': 'Artist',
-                    'track_name': 'Track Name',
-                    'streams': 'Streams',
-                    'source': 'Label'
-                }
-                df = df.rename(columns=column_mapping)
-                
-                # Extraer la fecha del nombre del archivo y convertirla correctamente
-                date_str = os.path.basename(file).split('daily-')[-1].replace('.csv', '')
-                try:
-                    date = datetime.strptime(date_str, '%Y-%m-%d')
-                    df['date'] = date
-                    dfs.append(df)
-                except ValueError as e:
-                    st.warning(f"Error al procesar la fecha del archivo {file}: {str(e)}")
-                
-            except Exception as e:
-                st.warning(f"Error al cargar {file}: {str(e)}")
-        
-        if not dfs:
-            st.error(f"No se encontraron archivos CSV válidos para {countries[country_code]}")
-            continue
-        
-        # Concatenar todos los DataFrames
-        final_df = pd.concat(dfs, ignore_index=True)
-        
-        # Asegurarse de que las columnas numéricas sean del tipo correcto
-        final_df['Position'] = pd.to_numeric(final_df['Position'], errors='coerce')
-        final_df['Streams'] = pd.to_numeric(final_df['Streams'], errors='coerce')
-        
-        # Crear DataFrame expandido con artistas individuales
-        artists_expanded = final_df.copy()
-        artists_expanded['Artist'] = artists_expanded['Artist'].str.split(', ')
-        artists_expanded = artists_expanded.explode('Artist')
-        
-        # Crear DataFrame expandido con labels individuales
-        labels_expanded = final_df.copy()
-        labels_expanded['Label'] = labels_expanded['Label'].str.split(' / ')
-        labels_expanded = labels_expanded.explode('Label')
-        # Limpiar espacios en blanco en las labels
-        labels_expanded['Label'] = labels_expanded['Label'].str.strip()
-        
-        all_dfs[country_code] = final_df
-        all_artists_expanded[country_code] = artists_expanded
-        all_labels_expanded[country_code] = labels_expanded
-    
-    return all_dfs, all_artists_expanded, all_labels_expanded
-
-# Cargar los datos
-all_dfs, all_artists_expanded, all_labels_expanded = load_data()
-
-if all_dfs:
-    # Selector de país
-    country_options = {
-        'ar': 'Argentina',
-        'cl': 'Chile',
-        'uy': 'Uruguay',
-        'mx': 'México',
-        'es': 'España'
-    }
-    selected_country = st.sidebar.selectbox(
-        "Seleccionar País",
+# Datos compartidos entre sesiones; se actualizan solos cuando el bot agrega CSV
+@st.cache_resource
+def get_chart_store():
+    return ChartStore()
+
+# Filas filtradas y agregados por sección, compartidos entre sesiones
+@st.cache_resource
+def get_result_cache():
+    return ResultCache()
+
+store = get_chart_store()
+results = get_result_cache()
+
+# Selector de país
+country_options = {
+    'ar': 'Argentina',
+    'cl': 'Chile',
+    'uy': 'Uruguay',
+    'mx': 'México',
+    'es': 'España'
+}
+
+# Modo comparación: los mismos agregados para varios países a la vez
+if st.sidebar.checkbox("Comparar países"):
+    compared_countries = st.sidebar.multiselect(
+        "Países",
         options=list(country_options.keys()),
+        default=list(country_options.keys()),
         format_func=lambda x: country_options[x]
     )
-    
-    # Obtener los DataFrames del país seleccionado
-    df = all_dfs[selected_country]
-    df_artists = all_artists_expanded[selected_country]
-    df_labels = all_labels_expanded[selected_country]
+    # Los países comparados no se descartan de memoria mientras se calculan
+    with store.pinned(compared_countries):
+        show_comparison(compared_countries)
+    finish_run(",".join(compared_countries))
+    st.stop()
+
+selected_country = st.sidebar.selectbox(
+    "Seleccionar País",
+    options=list(country_options.keys()),
+    format_func=lambda x: country_options[x]
+)
+
+# Cargar solo el país seleccionado (si ya está en memoria, solo se leen los CSV nuevos)
+with recorder.time("load"), st.spinner(f"Cargando datos de {country_options[selected_country]}..."):
+    country = store.get(selected_country)
+
+if country is None:
+    st.error(f"No se encontraron archivos CSV válidos para {country_options[selected_country]}")
+else:
+    # Artistas y labels como ids enteros vinculados a cada fila, y cubos pre-agregados
+    data = country.data
+    rollups = country.rollups
+    df = data.df
     
     # Sidebar para filtros
     st.sidebar.header("Filtros")
@@ -163,29 +268,51 @@ if all_dfs:
         value=50
     )
     
-    # Aplicar filtros a los DataFrames
-    mask = (df['date'].dt.date >= start_date) & (df['date'].dt.date <= end_date)
-    mask &= (df['Position'] >= min_position) & (df['Position'] <= max_position)
-    filtered_df = df[mask]
-    
-    mask_artists = (df_artists['date'].dt.date >= start_date) & (df_artists['date'].dt.date <= end_date)
-    mask_artists &= (df_artists['Position'] >= min_position) & (df_artists['Position'] <= max_position)
-    filtered_df_artists = df_artists[mask_artists]
-    
-    mask_labels = (df_labels['date'].dt.date >= start_date) & (df_labels['date'].dt.date <= end_date)
-    mask_labels &= (df_labels['Position'] >= min_position) & (df_labels['Position'] <= max_position)
-    filtered_df_labels = df_labels[mask_labels]
+    # Los resultados de cada sección se reutilizan si otra ejecución (de cualquier
+    # sesión) ya usó el mismo país, versión de datos y filtros
+    filters = (selected_country, country.version, start_date, end_date, min_position, max_position)
+    
+    def cached(section, compute, *args):
+        key = filters + (section,) + args
+        value = results.get(key)
+        if value is None:
+            recorder.count("cache_misses")
+            value = compute()
+            results.put(key, value)
+        else:
+            recorder.count("cache_hits")
+        return value
+    
+    # Aplicar filtros por búsqueda binaria sobre el índice (fecha, posición);
+    # artistas y labels se filtran vía sus puentes
+    with recorder.time("filter"):
+        rows = cached('rows', lambda: data.select(start_date, end_date, min_position, max_position))
+    recorder.count("filtered_rows", len(rows))
+    
+    # Conteos por canción, artista y label leídos de los cubos pre-agregados
+    def query_rollup(kind, positions=(min_position, max_position)):
+        return query(data, rollups, kind, start_date, end_date, *positions)
+    
+    def metrics():
+        track_counts, track_streams = query_rollup('tracks')
+        artist_counts, _ = query_rollup('artists')
+        label_counts, _ = query_rollup('labels')
+        unique_tracks = data.tracks['Track Name'][track_counts > 0].nunique()
+        return track_counts, track_streams, artist_counts, label_counts, unique_tracks
+    
+    with recorder.time("metrics"):
+        track_counts, track_streams, artist_counts, label_counts, unique_tracks = cached('metrics', metrics)
     
     # Métricas principales
     col1, col2, col3, col4, col5 = st.columns(5)
     with col1:
-        st.metric("Total de canciones únicas", filtered_df['Track Name'].nunique())
+        st.metric("Total de canciones únicas", unique_tracks)
     with col2:
-        st.metric("Total de artistas únicos", filtered_df_artists['Artist'].nunique())
+        st.metric("Total de artistas únicos", int(np.count_nonzero(artist_counts)))
     with col3:
-        st.metric("Total de labels", filtered_df_labels['Label'].nunique())
+        st.metric("Total de labels", int(np.count_nonzero(label_counts)))
     with col4:
-        st.metric("Total de streams", f"{filtered_df['Streams'].sum():,}")
+        st.metric("Total de streams", f"{track_streams.sum():,}")
     with col5:
         st.metric("Período analizado", f"{start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')}")
     
@@ -193,15 +320,21 @@ if all_dfs:
     st.header("🏆 Análisis de Números 1")
     
     # Filtrar solo posición #1
-    number_ones = filtered_df[filtered_df['Position'] == 1]
-    number_ones_artists = filtered_df_artists[filtered_df_artists['Position'] == 1]
-    number_ones_labels = filtered_df_labels[filtered_df_labels['Position'] == 1]
+    number_one_positions = (max(min_position, 1), min(max_position, 1))
+    def number_ones():
+        track_days_n1, _ = query_rollup('tracks', number_one_positions)
+        artist_days_n1, _ = query_rollup('artists', number_one_positions)
+        label_days_n1, _ = query_rollup('labels', number_one_positions)
+        return track_days_n1, artist_days_n1, label_days_n1
+    
+    with recorder.time("number_ones"):
+        track_days_n1, artist_days_n1, label_days_n1 = cached('number_ones', number_ones)
     
     # Artistas con más días en el #1
     st.subheader("Artistas con Más Días en el #1")
     
     # Calcular días totales por artista
-    total_days = number_ones_artists['Artist'].value_counts().reset_index()
+    total_days = top_counts(artist_days_n1, data.artists.names).reset_index()
     total_days.columns = ['Artista', 'Días']
     
     # Crear gráfico de días totales
@@ -217,15 +350,21 @@ if all_dfs:
     fig_days.update_traces(textposition='auto')
     fig_days.update_layout(height=500)
     
-    st.plotly_chart(fig_days, use_container_width=True)
+    plot_chart(fig_days)
     
     # Artistas con más canciones diferentes en el #1
     st.subheader("Artistas con Más Canciones en el #1")
     
     # Contar canciones únicas por artista
-    songs_by_artist = number_ones_artists.groupby('Artist')['Track Name'].nunique().reset_index()
-    songs_by_artist.columns = ['Artista', 'Canciones']
-    songs_by_artist = songs_by_artist.sort_values('Canciones', ascending=False)
+    def number_ones_songs():
+        rows_number_ones = data.select(start_date, end_date, *number_one_positions)
+        number_ones_artists = expand_dimension(data, data.artists, rows_number_ones, 'Artist', columns=('Track Name',))
+        songs_by_artist = number_ones_artists.groupby('Artist', observed=True)['Track Name'].nunique().reset_index()
+        songs_by_artist.columns = ['Artista', 'Canciones']
+        return songs_by_artist.sort_values('Canciones', ascending=False)
+    
+    with recorder.time("number_ones_songs"):
+        songs_by_artist = cached('number_ones_songs', number_ones_songs)
     
     # Crear gráfico de canciones
     fig_songs = px.bar(
@@ -240,95 +379,106 @@ if all_dfs:
     fig_songs.update_traces(textposition='auto')
     fig_songs.update_layout(height=500)
     
-    st.plotly_chart(fig_songs, use_container_width=True)
+    plot_chart(fig_songs)
     
     # Labels con más números 1
     st.subheader("Discográficas con Más Números 1")
-    top_labels = number_ones_labels['Label'].value_counts().head(10)
+    top_labels = top_counts(label_days_n1, data.labels.names, 10)
     fig_labels = px.bar(
         x=top_labels.index,
         y=top_labels.values,
         title="Discográficas con más días en el #1",
         labels={'x': 'Discográfica', 'y': 'Días en #1'}
     )
-    st.plotly_chart(fig_labels, use_container_width=True)
+    plot_chart(fig_labels)
     
     # Canciones con más días en número 1
     st.subheader("Canciones con Más Días en #1")
-    top_songs_n1 = number_ones.groupby(['Track Name', 'Artist'])['date'].count().sort_values(ascending=False).head(10)
+    top_songs_n1_ids = top_ids(track_days_n1, 10)
+    top_songs_n1 = data.tracks.iloc[top_songs_n1_ids]
     fig_songs_n1 = px.bar(
-        x=top_songs_n1.index.get_level_values('Track Name'),
-        y=top_songs_n1.values,
-        color=top_songs_n1.index.get_level_values('Artist'),
+        x=top_songs_n1['Track Name'],
+        y=track_days_n1[top_songs_n1_ids],
+        color=top_songs_n1['Artist'],
         title="Canciones con más días en el #1",
         labels={'x': 'Canción', 'y': 'Días en #1'}
     )
-    st.plotly_chart(fig_songs_n1, use_container_width=True)
+    plot_chart(fig_songs_n1)
+    
+    # Rachas de días consecutivos en el #1 (un día sin CSV no corta la racha)
+    st.subheader("Rachas Más Largas en el #1")
+    streak_kind_n1 = st.radio("Rachas de", options=list(STREAK_KINDS), format_func=STREAK_KINDS.get,
+                              horizontal=True, key="streaks_n1")
+    with recorder.time("streaks"):
+        streaks_n1 = cached('streaks_n1', lambda: longest_streaks(
+            data, data.select(start_date, end_date, *number_one_positions), streak_kind_n1
+        ), streak_kind_n1)
+    show_streaks(streaks_n1)
     
     # Top Artistas (considerando colaboraciones)
     st.header("📊 Estadísticas Generales")
     
     # Top Labels Overall
     st.subheader("Top 10 Discográficas")
-    top_labels_overall = filtered_df_labels['Label'].value_counts().head(10)
+    top_labels_overall = top_counts(label_counts, data.labels.names, 10)
     fig_top_labels = px.bar(
         x=top_labels_overall.index,
         y=top_labels_overall.values,
         title="Discográficas con más apariciones en el Top",
         labels={'x': 'Discográfica', 'y': 'Número de apariciones'}
     )
-    st.plotly_chart(fig_top_labels, use_container_width=True)
+    plot_chart(fig_top_labels)
     
     st.subheader("Top 10 Artistas por Apariciones")
-    top_artists_overall = filtered_df_artists['Artist'].value_counts().head(10)
+    top_artists_overall = top_counts(artist_counts, data.artists.names, 10)
     fig_top_artists = px.bar(
         x=top_artists_overall.index,
         y=top_artists_overall.values,
         title="Artistas con más apariciones en el Top",
         labels={'x': 'Artista', 'y': 'Número de apariciones'}
     )
-    st.plotly_chart(fig_top_artists, use_container_width=True)
+    plot_chart(fig_top_artists)
+    
+    # Permanencia continua dentro del rango de posiciones elegido
+    st.subheader("Rachas Más Largas en el Top")
+    streak_kind = st.radio("Rachas de", options=list(STREAK_KINDS), format_func=STREAK_KINDS.get,
+                           horizontal=True, key="streaks_top")
+    with recorder.time("streaks"):
+        streaks_top = cached('streaks', lambda: longest_streaks(data, rows, streak_kind), streak_kind)
+    show_streaks(streaks_top)
     
     # Gráfico de evolución de artistas en el top
     st.subheader("Evolución de Artistas en el Top")
     
-    # Identificar los 10 artistas más frecuentes en el top 10
-    # Usamos el DataFrame expandido que ya tiene los artistas separados
-    artist_frequencies = filtered_df_artists[filtered_df_artists['Position'] <= 10]['Artist'].value_counts()
-    top_10_artists = artist_frequencies.head(10).index.tolist()
-    
-    # Crear diccionario de artistas por fecha
-    top_artists_by_date = {}
-    for date in filtered_df_artists['date'].unique():
-        # Obtener los artistas para cada fecha
-        day_artists = filtered_df_artists[filtered_df_artists['date'] == date].sort_values('Position')
-        # Filtrar solo los top 10 artistas más frecuentes
-        day_top_artists = day_artists[day_artists['Artist'].isin(top_10_artists)]
-        # Agrupar por artista y tomar la mejor posición para cada uno
-        day_top_artists = day_top_artists.groupby('Artist')['Position'].min().reset_index()
-        top_artists_by_date[date] = dict(zip(day_top_artists['Artist'], day_top_artists['Position']))
-    
-    # Obtener datos de artistas
-    artist_data = []
-    for date in filtered_df_artists['date'].unique():
-        for artist in top_10_artists:
-            position = top_artists_by_date[date].get(artist, None)
-            artist_data.append({
-                'Fecha': date,
-                'Artista': artist,
-                'Posición': position
-            })
-    
-    df_artists = pd.DataFrame(artist_data)
-    
-    # Crear gráfico de líneas
+    resolution = st.radio("Resolución", options=list(RESOLUTIONS), format_func=RESOLUTIONS.get,
+                          horizontal=True)
+    
+    def evolution():
+        # Identificar los 10 artistas más frecuentes en el top 10
+        artist_counts_top10, _ = query_rollup('artists', (min_position, min(max_position, 10)))
+        top_10_ids = top_ids(artist_counts_top10, 10)
+        
+        # Mejor posición diaria de cada artista (fecha x artista) en una sola agrupación,
+        # agrupada por semana o mes si el rango es largo
+        positions_pivot = member_position_pivot(data, data.artists, rows, top_10_ids)
+        chosen, positions_pivot = adaptive_pivot(positions_pivot, MAX_PLOT_POINTS, resolution)
+        return chosen, capped_long(
+            positions_pivot, 'Fecha', 'Artista', 'Posición',
+            key_names=data.artists.names[top_10_ids], max_points=MAX_PLOT_POINTS
+        )
+    
+    with recorder.time("evolution"):
+        resolution, df_artists = cached('evolution', evolution, resolution)
+    recorder.count("evolution_points", len(df_artists))
+    
+    # Crear gráfico de líneas (WebGL: el navegador no redibuja miles de nodos SVG)
     fig = px.line(df_artists, 
                   x='Fecha', 
                   y='Posición',
                   color='Artista',
                   title='Evolución de Posiciones de los 10 Artistas Más Frecuentes',
-                  labels={'Posición': 'Posición en el Top'},
-                  line_shape='spline')  # Usar spline para suavizar las líneas
+                  labels={'Posición': 'Mejor posición en el Top'},
+                  render_mode='webgl')
     
     # Invertir el eje Y para que la posición 1 esté arriba
     fig.update_yaxes(autorange="reversed", range=[10.5, 0.5])
@@ -344,7 +494,7 @@ if all_dfs:
             x=0.01
         ),
         xaxis=dict(
-            tickformat='%d/%m/%Y',
+            tickformat=DATE_FORMATS[resolution],
             tickangle=45
         ),
         yaxis=dict(
@@ -354,12 +504,12 @@ if all_dfs:
         )
     )
     
-    st.plotly_chart(fig, use_container_width=True)
+    plot_chart(fig)
     
     # Gráfico de canciones más populares
     st.subheader("Canciones Más Populares")
-    top_songs = filtered_df.groupby(['Track Name', 'Artist'])['Streams'].sum().reset_index()
-    top_songs = top_songs.sort_values('Streams', ascending=False).head(10)
+    top_songs_ids = top_ids(track_streams, 10)
+    top_songs = data.tracks.iloc[top_songs_ids].assign(Streams=track_streams[top_songs_ids])
     
     fig_songs = px.bar(
         top_songs,
@@ -369,11 +519,47 @@ if all_dfs:
         title='Top 10 Canciones por Total de Streams',
         labels={'Streams': 'Total de Streams', 'Track Name': 'Canción'}
     )
-    st.plotly_chart(fig_songs, use_container_width=True)
+    plot_chart(fig_songs)
+    
+    # Las canciones tienen el mismo id (URI) en todos los países cargados
+    st.subheader("Canciones Más Populares en Otros Países")
+    if len(top_songs_ids):
+        selected_track = st.selectbox(
+            "Canción",
+            options=list(top_songs_ids),
+            format_func=lambda track_id: f"{data.tracks['Track Name'].iat[track_id]} - {data.tracks['Artist'].iat[track_id]}"
+        )
+        loaded_countries = {code: store.get(code) for code in store.loaded()}
+        presence = track_presence(
+            {code: loaded.data for code, loaded in loaded_countries.items() if loaded is not None},
+            [selected_track]
+        )
+        presence = presence.assign(country=presence['country'].map(country_options))
+        st.dataframe(
+            presence[['country', 'first_date', 'last_date', 'days', 'best_position', 'lag_days']].rename(columns={
+                'country': 'País', 'first_date': 'Primera fecha', 'last_date': 'Última fecha',
+                'days': 'Días en el chart', 'best_position': 'Mejor posición', 'lag_days': 'Retraso (días)'
+            }),
+            hide_index=True
+        )
+        missing = [country_options[code] for code in country_options if code not in loaded_countries]
+        if missing:
+            st.caption(f"Sin datos en memoria para: {', '.join(missing)}")
     
     # Tabla de datos
     st.subheader("Datos Detallados")
-    st.dataframe(
-        filtered_df[['date', 'Position', 'Track Name', 'Artist', 'Label', 'Streams']].sort_values(['date', 'Position']),
-        use_container_width=True
-    ) 
\ No newline at end of file
+    # Solo se arma y se envía la página visible; las filas ya están ordenadas por (fecha, posición)
+    search_col, page_col = st.columns([3, 1])
+    with search_col:
+        search = st.text_input("Buscar canción, artista o label")
+    with recorder.time("table"):
+        matching_rows = cached('search', lambda: data.search(rows, search), search.strip())
+        total_rows = len(matching_rows)
+        total_pages = max((total_rows + PAGE_SIZE - 1) // PAGE_SIZE, 1)
+        with page_col:
+            page = st.number_input("Página", min_value=1, max_value=total_pages, value=1)
+        page_rows = matching_rows.slice((page - 1) * PAGE_SIZE, page * PAGE_SIZE)
+        st.dataframe(data.frame(page_rows, DETAIL_COLUMNS), use_container_width=True, hide_index=True)
+    st.caption(f"{total_rows:,} filas · página {page} de {total_pages}")
+
+finish_run(selected_country)
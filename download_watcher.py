@@ -0,0 +1,78 @@
+"""Detección de descargas completas de Chrome por nombre de archivo.
+
+Chrome escribe cada descarga en ``<nombre>.crdownload`` y la renombra al nombre
+final cuando termina, así que basta con consultar esos dos nombres en lugar de
+listar la carpeta completa. El watcher admite varias descargas pendientes a la
+vez para que el bot pueda navegar a la siguiente fecha mientras termina la
+anterior.
+"""
+import os
+import time
+
+IN_PROGRESS_SUFFIX = ".crdownload"
+
+
+class DownloadWatcher:
+    """Seguimiento de descargas esperadas en una carpeta.
+
+    ``timeout`` es el tiempo máximo para que una descarga aparezca o, si ya
+    está en curso, el tiempo máximo sin que el archivo parcial crezca.
+    """
+
+    def __init__(self, download_dir, timeout=10.0, poll_interval=0.05, max_pending=4):
+        self.download_dir = download_dir
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.max_pending = max_pending
+        self.pending = {}  # clave -> [nombre, fecha límite, tamaño parcial]
+
+    def expect(self, key, filename):
+        """Registrar una descarga recién iniciada"""
+        self.pending[key] = [filename, time.monotonic() + self.timeout, -1]
+
+    def poll(self):
+        """Revisar las descargas pendientes una vez.
+
+        Devuelve (completadas, fallidas): una lista de (clave, ruta) y una lista
+        de claves que superaron el tiempo de espera.
+        """
+        completed, failed = [], []
+        now = time.monotonic()
+        for key, state in list(self.pending.items()):
+            filename, deadline, partial_size = state
+            path = os.path.join(self.download_dir, filename)
+            if os.path.exists(path) and not os.path.exists(path + IN_PROGRESS_SUFFIX):
+                completed.append((key, path))
+                del self.pending[key]
+                continue
+            try:
+                size = os.path.getsize(path + IN_PROGRESS_SUFFIX)
+            except OSError:
+                size = -1
+            if size > partial_size:
+                # La descarga sigue avanzando: extender el plazo
+                state[1] = now + self.timeout
+                state[2] = size
+            elif now >= deadline:
+                failed.append(key)
+                del self.pending[key]
+        return completed, failed
+
+    def wait(self, until_pending=0):
+        """Esperar hasta que queden como máximo ``until_pending`` descargas pendientes"""
+        completed, failed = [], []
+        while True:
+            done, timed_out = self.poll()
+            completed.extend(done)
+            failed.extend(timed_out)
+            if len(self.pending) <= until_pending:
+                return completed, failed
+            time.sleep(self.poll_interval)
+
+    def throttle(self):
+        """Esperar solo si ya hay ``max_pending`` descargas en curso"""
+        return self.wait(until_pending=self.max_pending - 1)
+
+    def drain(self):
+        """Esperar a que terminen (o fallen) todas las descargas pendientes"""
+        return self.wait(until_pending=0)
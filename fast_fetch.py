@@ -0,0 +1,221 @@
+"""Descarga directa por HTTP reutilizando la sesión del navegador.
+
+Abrir cada página de charts en Chrome solo para hacer clic en el botón de CSV
+cuesta segundos por fecha. Este módulo toma las cookies (y el token, si la
+página lo expone) de una sesión ya iniciada con Selenium y pide cada fecha con
+un cliente asyncio de conexiones reutilizadas, concurrencia acotada y límite
+de pedidos por segundo. Si el servidor rechaza la sesión se corta la descarga
+para que el bot siga por el navegador.
+
+Uso independiente (por ejemplo contra ``charts_stub.py``):
+    python fast_fetch.py ar 2024-01-01 2024-01-31 --session session.json \\
+        --api-url "http://127.0.0.1:8765/charts/{chart}/{date}"
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+from manifest import CSV_COLUMNS
+
+API_URL = "https://charts-spotify-com-service.spotify.com/auth/v0/charts/{chart}/{date}"
+CONCURRENCY = 4
+REQUESTS_PER_SECOND = 4.0
+REQUEST_TIMEOUT = 20
+
+# Script para buscar un token de acceso guardado por la aplicación web
+TOKEN_SCRIPT = """
+for (const storage of [window.localStorage, window.sessionStorage]) {
+    for (let i = 0; i < storage.length; i++) {
+        const value = storage.getItem(storage.key(i));
+        const match = value && value.match(/"accessToken"\\s*:\\s*"([^"]+)"/);
+        if (match) return match[1];
+    }
+}
+return null;
+"""
+
+
+class AuthError(Exception):
+    """El servidor rechazó la sesión exportada (hay que volver a loguearse)"""
+
+
+def export_session(driver):
+    """Cookies, token y user agent de una sesión de Selenium ya logueada"""
+    try:
+        token = driver.execute_script(TOKEN_SCRIPT)
+    except Exception:
+        token = None
+    browser_cookies = driver.get_cookies()
+    return {
+        'cookies': {cookie['name']: cookie['value'] for cookie in browser_cookies},
+        'browser_cookies': browser_cookies,
+        'token': token,
+        'user_agent': driver.execute_script("return navigator.userAgent;"),
+    }
+
+
+def save_session(session, path):
+    with open(path, 'w') as f:
+        json.dump(session, f)
+
+
+def load_session(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def entries_to_csv(payload):
+    """Convertir la respuesta JSON del servicio de charts al CSV del botón"""
+    output = io.StringIO()
+    # Mismo formato que el botón: encabezado sin comillas y textos entre comillas
+    output.write(",".join(CSV_COLUMNS) + "\n")
+    writer = csv.writer(output, quoting=csv.QUOTE_NONNUMERIC, lineterminator="\n")
+    for entry in payload['entries']:
+        chart = entry['chartEntryData']
+        track = entry['trackMetadata']
+        writer.writerow([
+            chart['currentRank'],
+            track['trackUri'],
+            ", ".join(artist['name'] for artist in track['artists']),
+            track['trackName'],
+            " / ".join(label['name'] for label in track.get('labels', [])),
+            chart.get('peakRank', chart['currentRank']),
+            chart.get('previousRank', -1),
+            chart.get('appearancesOnChart', 1),
+            str(chart['rankingMetric']['value']),
+        ])
+    return output.getvalue().encode('utf-8')
+
+
+class RateLimiter:
+    """Espaciar el inicio de los pedidos a un máximo por segundo"""
+
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second if per_second else 0.0
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def fetch_date(http, limiter, semaphore, api_url, country_code, date, download_dir, auth_failed=None):
+    """Descargar una fecha y guardarla con el nombre del CSV del botón.
+
+    Si ``auth_failed`` (un ``asyncio.Event``) se activó mientras se esperaba
+    turno, no se hace el pedido y se lanza ``AuthError``.
+    """
+    url = api_url.format(chart=f"regional-{country_code}-daily", date=date)
+    async with semaphore:
+        await limiter.acquire()
+        # Otro pedido pudo recibir un 401 mientras este esperaba su turno
+        if auth_failed is not None and auth_failed.is_set():
+            raise AuthError("Sesión rechazada en un pedido anterior")
+        async with http.get(url) as response:
+            if response.status in (401, 403):
+                raise AuthError(f"HTTP {response.status} para {url}")
+            response.raise_for_status()
+            body = await response.read()
+            content_type = response.headers.get('Content-Type', '')
+
+    if 'json' in content_type:
+        body = entries_to_csv(json.loads(body))
+    if not body.lstrip(b'\xef\xbb\xbf').startswith(b'rank,'):
+        raise ValueError("La respuesta no es un CSV de charts")
+
+    path = os.path.join(download_dir, f"regional-{country_code}-daily-{date}.csv")
+    tmp_path = path + ".part"
+    with open(tmp_path, 'wb') as f:
+        f.write(body)
+    os.replace(tmp_path, path)
+    return path
+
+
+async def fetch_all(jobs, session, base_dir, api_url=API_URL, concurrency=CONCURRENCY,
+                    requests_per_second=REQUESTS_PER_SECOND, on_failure=None):
+    """Descargar una lista de (país, fecha) con un pool de conexiones.
+
+    Devuelve (descargadas, pendientes): las fechas pendientes son las que
+    quedaron sin pedir o fueron rechazadas por un error de autenticación y
+    deben seguir por el navegador. Los demás errores se informan con
+    ``on_failure(país, fecha, error)``.
+    """
+    import aiohttp
+
+    headers = {'User-Agent': session.get('user_agent') or 'Mozilla/5.0'}
+    if session.get('token'):
+        headers['Authorization'] = f"Bearer {session['token']}"
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    limiter = RateLimiter(requests_per_second)
+    semaphore = asyncio.Semaphore(concurrency)
+    auth_failed = asyncio.Event()
+    downloaded, pending = [], []
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers,
+                                     cookies=session.get('cookies', {})) as http:
+        async def run(country_code, date):
+            download_dir = os.path.join(base_dir, country_code)
+            os.makedirs(download_dir, exist_ok=True)
+            try:
+                await fetch_date(http, limiter, semaphore, api_url, country_code, date, download_dir,
+                                 auth_failed)
+                downloaded.append((country_code, date))
+            except AuthError as e:
+                if not auth_failed.is_set():
+                    print(f"Sesión rechazada ({e}); se continúa con el navegador")
+                auth_failed.set()
+                pending.append((country_code, date))
+            except Exception as e:
+                if on_failure is not None:
+                    on_failure(country_code, date, e)
+
+        await asyncio.gather(*(run(country_code, date) for country_code, date in jobs))
+
+    return downloaded, pending
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Descarga directa de charts por HTTP")
+    parser.add_argument("country")
+    parser.add_argument("start_date")
+    parser.add_argument("end_date")
+    parser.add_argument("--session", required=True, help="JSON con cookies y token exportados")
+    parser.add_argument("--api-url", default=API_URL)
+    parser.add_argument("--base-dir", default="spotify_downloads")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=REQUESTS_PER_SECOND,
+                        help="Pedidos por segundo")
+    args = parser.parse_args()
+
+    start = datetime.strptime(args.start_date, '%Y-%m-%d')
+    end = datetime.strptime(args.end_date, '%Y-%m-%d')
+    jobs = [(args.country, (start + timedelta(days=x)).strftime('%Y-%m-%d'))
+            for x in range((end - start).days + 1)]
+
+    def report(country_code, date, error):
+        print(f"Fallo en {country_code.upper()} {date}: {error}")
+
+    started = time.monotonic()
+    downloaded, pending = asyncio.run(fetch_all(
+        jobs, load_session(args.session), args.base_dir, args.api_url,
+        args.concurrency, args.rate, on_failure=report
+    ))
+    print(f"Descargadas: {len(downloaded)}, pendientes: {len(pending)} "
+          f"({time.monotonic() - started:.1f}s)")
+    if pending:
+        raise SystemExit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Tiempos y contadores por etapa para el dashboard y el bot.
+
+Un ``Recorder`` acumula la duración de cada etapa (cantidad de llamadas,
+total y máximo) y contadores simples. Al final de una corrida se puede
+escribir como una línea JSON (``.jsonl``) o como un textfile de Prometheus
+(``.prom``, para el textfile collector de node_exporter).
+"""
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Recorder:
+    """Acumulador de tiempos y contadores, seguro entre hilos"""
+
+    def __init__(self, name):
+        self.name = name
+        self.stages = {}     # etapa -> [llamadas, total, máximo]
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def time(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            stats = self.stages.setdefault(stage, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+
+    def count(self, counter, value=1):
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def summary(self):
+        """Etapas en el orden en que se registraron, con llamadas, total y máximo"""
+        with self.lock:
+            return {stage: {'calls': calls, 'seconds': total, 'max_seconds': longest}
+                    for stage, (calls, total, longest) in self.stages.items()}
+
+    def write(self, path, **labels):
+        """Guardar la corrida: Prometheus si ``path`` termina en .prom, si no JSONL"""
+        if path.endswith('.prom'):
+            self.write_prometheus(path, **labels)
+        else:
+            self.write_jsonl(path, **labels)
+
+    def write_jsonl(self, path, **labels):
+        with self.lock:
+            counters = dict(self.counters)
+        record = {'time': time.time(), 'run': self.name, 'labels': labels,
+                  'stages': self.summary(), 'counters': counters}
+        with open(path, 'a') as f:
+            f.write(json.dumps(record) + "\n")
+
+    def write_prometheus(self, path, **labels):
+        prefix = f"spotify_{_metric_name(self.name)}"
+        lines = [f"# TYPE {prefix}_stage_seconds_total counter",
+                 f"# TYPE {prefix}_stage_calls_total counter",
+                 f"# TYPE {prefix}_stage_max_seconds gauge"]
+        for stage, stats in self.summary().items():
+            stage_labels = _labels(labels, stage=stage)
+            lines.append(f"{prefix}_stage_seconds_total{stage_labels} {stats['seconds']:.6f}")
+            lines.append(f"{prefix}_stage_calls_total{stage_labels} {stats['calls']}")
+            lines.append(f"{prefix}_stage_max_seconds{stage_labels} {stats['max_seconds']:.6f}")
+        with self.lock:
+            counters = dict(self.counters)
+        for counter, value in counters.items():
+            metric = f"{prefix}_{_metric_name(counter)}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_labels(labels)} {value}")
+        lines.append(f"# TYPE {prefix}_last_run_timestamp_seconds gauge")
+        lines.append(f"{prefix}_last_run_timestamp_seconds{_labels(labels)} {time.time():.0f}")
+
+        # El collector puede leer en cualquier momento: escritura atómica
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+
+def _metric_name(name):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+
+def _labels(labels, **extra):
+    labels = {**labels, **extra}
+    if not labels:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for value in labels.values())
+    return "{" + ",".join(f'{_metric_name(key)}="{value}"' for key, value in zip(labels, escaped)) + "}"
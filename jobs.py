@@ -0,0 +1,268 @@
+"""Registro transaccional de descargas del bot (SQLite).
+
+Reemplaza a ``failed_dates_<pais>.json``: cada (país, fecha) tiene estado,
+cantidad de intentos, último error y momento del próximo reintento. Los fallos
+se reintentan con espera exponencial en lugar de quedar descartados para
+siempre, y la base se abre en modo WAL para que varios workers (o varios
+procesos del bot) escriban a la vez.
+
+Uso:
+    python jobs.py gaps [pais ...]     # fechas sin descargar y su estado
+    python jobs.py reset [pais ...]    # volver a habilitar fechas abandonadas
+"""
+import argparse
+import glob
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import time
+
+JOURNAL_PATH = "jobs.db"
+
+# Espera antes del primer reintento; se duplica con cada fallo hasta MAX_DELAY
+BASE_DELAY = 30.0
+MAX_DELAY = 24 * 3600.0
+# Intentos totales antes de abandonar una fecha (se rehabilita con ``reset``)
+MAX_ATTEMPTS = 10
+# Intentos por fecha dentro de una misma corrida
+MAX_ATTEMPTS_PER_RUN = 3
+# Espera máxima dentro de una corrida por un reintento pendiente
+MAX_RETRY_WAIT = 120.0
+
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_ABANDONED = "abandoned"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    country TEXT NOT NULL,
+    date TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_retry REAL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (country, date)
+)
+"""
+
+
+def backoff_delay(attempts, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+    """Espera antes del próximo intento tras ``attempts`` fallos"""
+    return min(base_delay * 2 ** max(attempts - 1, 0), max_delay)
+
+
+class JobJournal:
+    """Tabla de trabajos (país, fecha) con una conexión SQLite por hilo"""
+
+    def __init__(self, path=JOURNAL_PATH, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.local = threading.local()
+        with self.connection() as conn:
+            conn.execute(SCHEMA)
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def record_success(self, country_code, date):
+        with self.connection() as conn:
+            conn.execute(
+                """INSERT INTO jobs (country, date, status, attempts, updated_at)
+                   VALUES (?, ?, ?, 1, ?)
+                   ON CONFLICT (country, date) DO UPDATE SET
+                       status = excluded.status, attempts = attempts + 1,
+                       last_error = NULL, next_retry = NULL, updated_at = excluded.updated_at""",
+                (country_code, date, STATUS_DONE, time.time()),
+            )
+
+    def record_failure(self, country_code, date, error):
+        """Registrar un fallo y devolver el momento del próximo reintento (o None)"""
+        now = time.time()
+        with self.connection() as conn:
+            # Lectura y escritura en una sola transacción con el lock de escritura tomado:
+            # otro worker u otro proceso no puede perder un intento entre las dos
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT attempts FROM jobs WHERE country = ? AND date = ?",
+                (country_code, date),
+            ).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            if attempts >= self.max_attempts:
+                status, next_retry = STATUS_ABANDONED, None
+            else:
+                status, next_retry = STATUS_FAILED, now + backoff_delay(attempts)
+            conn.execute(
+                """INSERT INTO jobs (country, date, status, attempts, last_error, next_retry, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (country, date) DO UPDATE SET
+                       status = excluded.status, attempts = excluded.attempts,
+                       last_error = excluded.last_error, next_retry = excluded.next_retry,
+                       updated_at = excluded.updated_at""",
+                (country_code, date, status, attempts, str(error)[:500], next_retry, now),
+            )
+        return next_retry
+
+    def blocked_dates(self, country_code, now=None):
+        """Fechas que no deben intentarse ahora (en espera o abandonadas)"""
+        now = time.time() if now is None else now
+        rows = self.connection().execute(
+            """SELECT date FROM jobs WHERE country = ?
+               AND (status = ? OR (status = ? AND next_retry > ?))""",
+            (country_code, STATUS_ABANDONED, STATUS_FAILED, now),
+        ).fetchall()
+        return {row[0] for row in rows}
+
+    def gaps(self, country_code=None):
+        """Fechas fallidas o abandonadas con su estado"""
+        query = "SELECT country, date, status, attempts, last_error, next_retry FROM jobs WHERE status != ?"
+        params = [STATUS_DONE]
+        if country_code is not None:
+            query += " AND country = ?"
+            params.append(country_code)
+        return self.connection().execute(query + " ORDER BY country, date", params).fetchall()
+
+    def reset(self, country_code=None):
+        """Rehabilitar fechas abandonadas para la próxima corrida"""
+        query = "UPDATE jobs SET status = ?, attempts = 0, next_retry = NULL WHERE status = ?"
+        params = [STATUS_FAILED, STATUS_ABANDONED]
+        if country_code is not None:
+            query += " AND country = ?"
+            params.append(country_code)
+        with self.connection() as conn:
+            return conn.execute(query, params).rowcount
+
+    def import_failed_dates(self, pattern="failed_dates_*.json"):
+        """Migrar los registros ``failed_dates_<pais>.json`` como fallos a reintentar"""
+        imported = 0
+        for log_file in glob.glob(pattern):
+            country_code = os.path.basename(log_file)[len("failed_dates_"):-len(".json")]
+            with open(log_file, 'r') as f:
+                dates = json.load(f)
+            with self.connection() as conn:
+                conn.executemany(
+                    """INSERT OR IGNORE INTO jobs (country, date, status, attempts, last_error, next_retry, updated_at)
+                       VALUES (?, ?, ?, 1, 'failed_dates json', 0, ?)""",
+                    [(country_code, date, STATUS_FAILED, time.time()) for date in dates],
+                )
+            os.replace(log_file, log_file + ".migrated")
+            imported += len(dates)
+        return imported
+
+
+class JobScheduler:
+    """Cola de trabajos de una corrida con reintentos por espera exponencial.
+
+    Varios hilos pueden pedir trabajos con ``next_job``. Un trabajo fallido
+    vuelve a la cola cuando vence su espera, hasta ``max_attempts_per_run``
+    intentos; los que quedarían para más adelante de ``max_wait`` se dejan
+    para la próxima corrida.
+    """
+
+    def __init__(self, journal, jobs, max_attempts_per_run=MAX_ATTEMPTS_PER_RUN,
+                 max_wait=MAX_RETRY_WAIT):
+        self.journal = journal
+        self.max_attempts_per_run = max_attempts_per_run
+        self.max_wait = max_wait
+        self.heap = [(0.0, country_code, date) for country_code, date in jobs]
+        heapq.heapify(self.heap)
+        self.attempts = {}
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def next_job(self, block=True):
+        """Siguiente (país, fecha) listo para intentar, o None si no queda nada.
+
+        Con ``block=False`` no espera reintentos futuros ni trabajos en curso.
+        """
+        with self.condition:
+            while True:
+                now = time.time()
+                if self.heap and self.heap[0][0] <= now:
+                    _, country_code, date = heapq.heappop(self.heap)
+                    self.in_flight += 1
+                    return country_code, date
+                if not block:
+                    return None
+                if self.heap and self.heap[0][0] - now <= self.max_wait:
+                    self.condition.wait(self.heap[0][0] - now)
+                elif self.in_flight:
+                    # Un trabajo en curso todavía puede fallar y volver a la cola
+                    self.condition.wait()
+                else:
+                    self.heap.clear()
+                    return None
+
+    def next_batch(self):
+        """Todos los trabajos listos (esperando el próximo reintento si hace falta)"""
+        first = self.next_job()
+        if first is None:
+            return []
+        batch = [first]
+        while True:
+            job = self.next_job(block=False)
+            if job is None:
+                return batch
+            batch.append(job)
+
+    def done(self, country_code, date):
+        self.journal.record_success(country_code, date)
+        self._finish()
+
+    def failed(self, country_code, date, error):
+        next_retry = self.journal.record_failure(country_code, date, error)
+        key = (country_code, date)
+        self.attempts[key] = self.attempts.get(key, 0) + 1
+        with self.condition:
+            if next_retry is not None and self.attempts[key] < self.max_attempts_per_run:
+                heapq.heappush(self.heap, (next_retry, country_code, date))
+        self._finish()
+
+    def release(self, country_code, date):
+        """Devolver un trabajo a la cola sin contar el intento (por ejemplo, para otro método de descarga)"""
+        with self.condition:
+            heapq.heappush(self.heap, (0.0, country_code, date))
+        self._finish()
+
+    def _finish(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estado de las descargas del bot")
+    parser.add_argument("command", choices=["gaps", "reset"])
+    parser.add_argument("countries", nargs="*")
+    parser.add_argument("--journal", default=JOURNAL_PATH)
+    args = parser.parse_args()
+
+    journal = JobJournal(args.journal)
+    countries = args.countries or [None]
+    if args.command == "reset":
+        for country_code in countries:
+            print(f"Fechas rehabilitadas: {journal.reset(country_code)}")
+        return
+
+    for country_code in countries:
+        rows = journal.gaps(country_code)
+        for country, date, status, attempts, last_error, next_retry in rows:
+            retry = time.strftime('%Y-%m-%d %H:%M', time.localtime(next_retry)) if next_retry else "-"
+            print(f"{country.upper()} {date} {status:9} intentos={attempts} "
+                  f"próximo={retry} error={last_error or ''}")
+        print(f"Total de huecos: {len(rows)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+"""Manifiesto validado de los CSV descargados de cada país.
+
+Cada carpeta ``spotify_downloads/<pais>/`` tiene un ``_manifest.jsonl`` con
+una línea por archivo: fecha, tamaño, mtime, filas, sha256, versión de esquema
+y estado (``ok``, ``truncated`` o ``invalid``). Los archivos se validan en una
+sola pasada por bloques al registrarse, así que el bot y el dashboard saben
+qué fechas faltan o están dañadas con una búsqueda en un diccionario, sin
+listar la carpeta ni abrir los CSV.
+
+El archivo solo crece (la última línea de cada archivo manda) y se relee
+desde donde se dejó. La carpeta se vuelve a recorrer si cambió su mtime (por
+ejemplo, si se copiaron CSV a mano) o alguno de sus archivos, y solo se
+validan los archivos nuevos o modificados. Los CSV reescritos en su lugar no
+cambian el mtime de la carpeta: para detectarlos se hace un ``stat`` de los
+archivos registrados (sin abrirlos), a lo sumo cada ``STAT_INTERVAL``
+segundos. Lo que descarga el bot no espera ese intervalo, porque se
+registra en el manifiesto al guardarse.
+
+Uso:
+    python manifest.py              # sincronizar y resumir todos los países
+    python manifest.py ar --full    # volver a validar todos los archivos de un país
+"""
+import argparse
+import codecs
+import csv
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+DOWNLOADS_DIR = "spotify_downloads"
+# Encabezado de los CSV del botón de descarga (también lo escriben fast_fetch y los charts de prueba)
+CSV_COLUMNS = ['rank', 'uri', 'artist_names', 'track_name', 'source',
+               'peak_rank', 'previous_rank', 'days_on_chart', 'streams']
+MANIFEST_FILE = "_manifest.jsonl"
+# Sube cuando cambian las columnas esperadas o las reglas de validación
+SCHEMA_VERSION = 1
+# Los charts diarios tienen 200 posiciones (a veces falta alguna); menos de esto es un archivo cortado
+MIN_ROWS = 150
+CHUNK_SIZE = 64 * 1024
+# Segundos entre revisiones (un stat por archivo) de CSV reescritos en su lugar
+STAT_INTERVAL = 5
+QUARANTINE_SUFFIX = ".corrupt"
+
+STATUS_OK = "ok"
+STATUS_TRUNCATED = "truncated"
+STATUS_INVALID = "invalid"
+
+
+def date_from_filename(filename):
+    """Extraer la fecha (YYYY-MM-DD) del nombre de un CSV diario"""
+    date_str = os.path.basename(filename).split('daily-')[-1].replace('.csv', '')
+    datetime.strptime(date_str, '%Y-%m-%d')  # Validar el formato
+    return date_str
+
+
+def _text_lines(f, digest, state):
+    """Líneas de texto de un archivo binario leído por bloques, actualizando el hash"""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    pending = ""
+    for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+        digest.update(chunk)
+        state['size'] += len(chunk)
+        lines = (pending + decoder.decode(chunk)).split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    state['final_newline'] = pending == ""
+    if pending:
+        yield pending
+
+
+def validate_csv(path):
+    """Validar un CSV de charts en una pasada: filas, sha256 y estado"""
+    digest = hashlib.sha256()
+    state = {'size': 0, 'final_newline': True}
+    rows, error = 0, None
+    try:
+        with open(path, 'rb') as f:
+            reader = csv.reader(_text_lines(f, digest, state))
+            header = next(reader, None)
+            if header != CSV_COLUMNS:
+                error = (STATUS_INVALID, "encabezado inesperado (¿página de error?)")
+            for row in reader:
+                if not row:
+                    continue
+                rows += 1
+                if len(row) != len(CSV_COLUMNS):
+                    error = error or (STATUS_TRUNCATED, f"fila {rows} con {len(row)} columnas")
+                    continue
+                if not row[0].isdigit():
+                    error = error or (STATUS_INVALID, f"posición inválida en la fila {rows}")
+    except UnicodeDecodeError as e:
+        error = (STATUS_INVALID, f"no es texto UTF-8: {e}")
+
+    if error is None:
+        if not state['final_newline']:
+            error = (STATUS_TRUNCATED, "falta el salto de línea final")
+        elif rows < MIN_ROWS:
+            error = (STATUS_TRUNCATED, f"solo {rows} filas")
+    status, message = error if error else (STATUS_OK, None)
+    return {'rows': rows, 'size': state['size'], 'sha256': digest.hexdigest(),
+            'schema': SCHEMA_VERSION, 'status': status, 'error': message}
+
+
+class Manifest:
+    """Manifiesto de una carpeta de CSV, seguro entre hilos"""
+
+    def __init__(self, country_code, csv_dir):
+        self.country_code = country_code
+        self.csv_dir = csv_dir
+        self.path = os.path.join(csv_dir, MANIFEST_FILE)
+        self.files = {}         # nombre -> entrada
+        self.by_date = {}       # fecha -> entrada (preferida si hay dos archivos)
+        self.offset = 0         # bytes del manifiesto ya leídos
+        self.file_id = None     # (dispositivo, inodo) del manifiesto leído; cambia si otro proceso lo reescribe
+        self.dir_mtime = None   # mtime de la carpeta en la última sincronización
+        self.files_checked = None  # time.monotonic() del último stat de todos los archivos
+        self.lock = threading.RLock()
+
+    # --- lectura y escritura del archivo ---
+
+    def _apply(self, entry):
+        if entry.get('deleted'):
+            self.files.pop(entry['file'], None)
+        else:
+            self.files[entry['file']] = entry
+
+    def _index_dates(self):
+        by_date = {}
+        own_prefix = f"regional-{self.country_code}-"
+        for name, entry in self.files.items():
+            # Si hay dos archivos para la misma fecha, preferir el del propio país
+            current = by_date.get(entry['date'])
+            if current is None or (name.startswith(own_prefix) and not current['file'].startswith(own_prefix)):
+                by_date[entry['date']] = entry
+        self.by_date = by_date
+
+    def _stat(self):
+        stat = os.stat(self.path)
+        return stat.st_size, (stat.st_dev, stat.st_ino)
+
+    def _read(self):
+        """Leer las líneas agregadas desde la última lectura"""
+        try:
+            size, file_id = self._stat()
+        except OSError:
+            return False
+        if file_id != self.file_id or size < self.offset:
+            # El manifiesto se reescribió (aquí o en otro proceso): leerlo completo
+            self.files, self.offset, self.file_id = {}, 0, file_id
+        if size == self.offset:
+            return True
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        complete = data[:data.rfind(b"\n") + 1]  # ignorar una línea a medio escribir
+        try:
+            entries = [json.loads(line) for line in complete.splitlines() if line.strip()]
+        except json.JSONDecodeError:
+            if self.offset == 0:
+                raise
+            # Se retomó a mitad de una línea: empezar de nuevo desde el principio
+            self.files, self.offset = {}, 0
+            return self._read()
+        for entry in entries:
+            self._apply(entry)
+        self.offset += len(complete)
+        self._index_dates()
+        return True
+
+    def _append(self, entries):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        for entry in entries:
+            self._apply(entry)
+        self.offset, self.file_id = self._stat()
+        self._index_dates()
+
+    def _rewrite(self):
+        """Reescribir el manifiesto compacto (una línea por archivo)"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for name in sorted(self.files):
+                f.write(json.dumps(self.files[name], ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+        self.offset, self.file_id = self._stat()
+
+    # --- sincronización con la carpeta ---
+
+    def _entry(self, name, stat):
+        entry = {'file': name, 'date': date_from_filename(name), 'mtime_ns': stat.st_mtime_ns}
+        entry.update(validate_csv(os.path.join(self.csv_dir, name)))
+        return entry
+
+    def sync(self, full=False):
+        """Recorrer la carpeta y validar los archivos nuevos o modificados.
+
+        Con ``full`` se vuelven a validar todos. Devuelve las entradas nuevas.
+        """
+        with self.lock:
+            if not os.path.isdir(self.csv_dir):
+                return []
+            self._read()
+            changed, seen = [], set()
+            with os.scandir(self.csv_dir) as entries:
+                for item in entries:
+                    if not item.name.endswith('.csv'):
+                        continue
+                    try:
+                        date_from_filename(item.name)
+                    except ValueError:
+                        continue
+                    seen.add(item.name)
+                    stat = item.stat()
+                    known = self.files.get(item.name)
+                    if (full or known is None or known['size'] != stat.st_size
+                            or known['mtime_ns'] != stat.st_mtime_ns or known['schema'] != SCHEMA_VERSION):
+                        changed.append(self._entry(item.name, stat))
+            changed.extend({'file': name, 'deleted': True} for name in set(self.files) - seen)
+            if full or not os.path.exists(self.path):
+                for entry in changed:
+                    self._apply(entry)
+                self._index_dates()
+                self._rewrite()
+            elif changed:
+                self._append(changed)
+            # Después de escribir: crear el manifiesto también cambia la carpeta
+            self.dir_mtime = os.stat(self.csv_dir).st_mtime_ns
+            self.files_checked = time.monotonic()
+            return changed
+
+    def _files_changed(self):
+        """Si algún archivo registrado cambió de tamaño o mtime, o desapareció.
+
+        Reescribir un CSV en su lugar no cambia el mtime de la carpeta; basta
+        con un ``stat`` por archivo, sin abrirlos.
+        """
+        for name, entry in self.files.items():
+            try:
+                stat = os.stat(os.path.join(self.csv_dir, name))
+            except OSError:
+                return True
+            if stat.st_size != entry['size'] or stat.st_mtime_ns != entry['mtime_ns']:
+                return True
+        return False
+
+    def _files_due(self):
+        """Si ya pasaron ``STAT_INTERVAL`` segundos desde la última revisión de los archivos"""
+        now = time.monotonic()
+        if self.files_checked is not None and now - self.files_checked < STAT_INTERVAL:
+            return False
+        self.files_checked = now
+        return True
+
+    def refresh(self):
+        """Poner al día el manifiesto: leer lo agregado y recorrer la carpeta si algo cambió.
+
+        Los archivos reescritos en su lugar se buscan a lo sumo cada ``STAT_INTERVAL`` segundos.
+        """
+        with self.lock:
+            self._read()
+            try:
+                dir_mtime = os.stat(self.csv_dir).st_mtime_ns
+            except OSError:
+                return self
+            if (dir_mtime != self.dir_mtime or not os.path.exists(self.path)
+                    or (self._files_due() and self._files_changed())):
+                self.sync()
+            return self
+
+    # --- consultas y registro ---
+
+    def record(self, path):
+        """Validar un archivo recién descargado y registrarlo; devuelve su entrada"""
+        name = os.path.basename(path)
+        with self.lock:
+            self._read()
+            entry = self._entry(name, os.stat(path))
+            self._append([entry])
+            return entry
+
+    def status(self, date):
+        """Estado del archivo de una fecha (None si no hay archivo)"""
+        entry = self.by_date.get(date)
+        return None if entry is None else entry['status']
+
+    def valid_files(self):
+        """Mapear fecha -> ruta de los archivos válidos"""
+        return {date: os.path.join(self.csv_dir, entry['file'])
+                for date, entry in self.by_date.items() if entry['status'] == STATUS_OK}
+
+    def damaged(self):
+        """Entradas de archivos truncados o inválidos"""
+        return [entry for entry in self.by_date.values() if entry['status'] != STATUS_OK]
+
+    def quarantine(self, entries):
+        """Apartar archivos dañados (``.corrupt``) para que se vuelvan a descargar"""
+        with self.lock:
+            moved = []
+            for entry in entries:
+                path = os.path.join(self.csv_dir, entry['file'])
+                if os.path.exists(path):
+                    os.replace(path, path + QUARANTINE_SUFFIX)
+                moved.append({'file': entry['file'], 'deleted': True})
+            if moved:
+                self._append(moved)
+            return len(moved)
+
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+def get_manifest(country_code, downloads_dir=DOWNLOADS_DIR, refresh=True):
+    """Manifiesto de un país (una instancia por carpeta en el proceso).
+
+    Con ``refresh=False`` no se mira la carpeta; alcanza para registrar archivos.
+    """
+    csv_dir = os.path.abspath(os.path.join(downloads_dir, country_code))
+    with _manifests_lock:
+        manifest = _manifests.get(csv_dir)
+        if manifest is None:
+            manifest = _manifests[csv_dir] = Manifest(country_code, csv_dir)
+    return manifest.refresh() if refresh else manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validar los CSV descargados")
+    parser.add_argument("countries", nargs="*")
+    parser.add_argument("--full", action="store_true", help="Volver a validar todos los archivos")
+    parser.add_argument("--downloads-dir", default=DOWNLOADS_DIR)
+    args = parser.parse_args()
+
+    from storage import COUNTRIES
+
+    damaged_total = 0
+    for country_code in args.countries or list(COUNTRIES):
+        if country_code not in COUNTRIES:
+            print(f"País desconocido: {country_code}")
+            sys.exit(1)
+        manifest = Manifest(country_code, os.path.join(args.downloads_dir, country_code))
+        changed = manifest.sync(full=args.full)
+        damaged = manifest.damaged()
+        damaged_total += len(damaged)
+        print(f"{country_code.upper()}: {len(manifest.valid_files())} válidos, {len(damaged)} dañados, "
+              f"{len(changed)} validados ahora")
+        for entry in sorted(damaged, key=lambda entry: entry['date']):
+            print(f"  {entry['date']} {entry['status']:9} {entry['error']}")
+    if damaged_total:
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""Consultas de los agregados del dashboard sin Streamlit.
+
+Un ``QueryEngine`` mantiene los países cargados (``ChartStore``) y una caché
+de resultados (``ResultCache``) entre consultas, así que un reporte con
+varios países y métricas corre en un solo proceso y sin recalcular lo ya
+consultado. Se puede usar importándolo, desde la línea de comandos o como un
+servidor HTTP local que responde JSON.
+
+Uso:
+    python queries.py top-artists --country mx --from 2024-01-01 --to 2024-03-31 --positions 1-50
+    python queries.py batch reporte.json           # lista de consultas en JSON
+    python queries.py serve --port 8766            # GET /query?metric=top-artists&country=mx&positions=1-50
+                                                   # POST /batch con una lista de consultas
+"""
+import argparse
+import itertools
+import json
+import sys
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from chart_data import top_ids
+from chart_store import ChartStore
+from result_cache import ResultCache
+from rollups import query
+from storage import COUNTRIES
+from streaks import longest_streaks
+
+DEFAULT_POSITIONS = (1, 200)
+DEFAULT_LIMIT = 10
+HOST = "127.0.0.1"
+PORT = 8766
+
+
+def _summary(country, start_date, end_date, min_position, max_position, limit):
+    data, rollups = country.data, country.rollups
+    track_counts, track_streams = query(data, rollups, 'tracks', start_date, end_date, min_position, max_position)
+    artist_counts, _ = query(data, rollups, 'artists', start_date, end_date, min_position, max_position)
+    label_counts, _ = query(data, rollups, 'labels', start_date, end_date, min_position, max_position)
+    return pd.DataFrame([{
+        'rows': int(track_counts.sum()),
+        'tracks': int(data.tracks['Track Name'][track_counts > 0].nunique()),
+        'artists': int(np.count_nonzero(artist_counts)),
+        'labels': int(np.count_nonzero(label_counts)),
+        'streams': int(track_streams.sum()),
+    }])
+
+
+def _top_tracks(country, start_date, end_date, min_position, max_position, limit, by='streams'):
+    counts, streams = query(country.data, country.rollups, 'tracks', start_date, end_date,
+                            min_position, max_position)
+    ids = top_ids(streams if by == 'streams' else counts, limit)
+    tracks = country.data.tracks
+    return pd.DataFrame({
+        'track': tracks['Track Name'].take(ids).to_numpy(),
+        'artist': tracks['Artist'].take(ids).to_numpy(),
+        'uri': tracks['uri'].take(ids).to_numpy(),
+        'appearances': counts[ids],
+        'streams': streams[ids],
+    })
+
+
+def _top_members(kind):
+    def top(country, start_date, end_date, min_position, max_position, limit):
+        counts, streams = query(country.data, country.rollups, kind, start_date, end_date,
+                                min_position, max_position)
+        ids = top_ids(counts, limit)
+        names = getattr(country.data, kind).names
+        return pd.DataFrame({'name': names[ids], 'appearances': counts[ids], 'streams': streams[ids]})
+    return top
+
+
+def _number_ones(metric):
+    # Como en el dashboard: solo si el rango de posiciones incluye el #1
+    def number_ones(country, start_date, end_date, min_position, max_position, limit):
+        positions = (max(min_position, 1), min(max_position, 1))
+        if metric == 'tracks':
+            result = _top_tracks(country, start_date, end_date, *positions, limit, by='count')
+        else:
+            result = _top_members(metric)(country, start_date, end_date, *positions, limit)
+        return result.drop(columns='streams').rename(columns={'appearances': 'days'})
+    return number_ones
+
+
+def _streams_by_month(country, start_date, end_date, min_position, max_position, limit):
+    data = country.data
+    rows = data.select(start_date, end_date, min_position, max_position)
+    months = rows.take(data.df['date'].to_numpy()).astype('datetime64[M]')
+    unique_months, inverse = np.unique(months, return_inverse=True)
+    streams = np.bincount(inverse, weights=rows.take(country.rollups.streams), minlength=len(unique_months))
+    return pd.DataFrame({'month': unique_months.astype('datetime64[ns]'), 'streams': streams.astype(np.int64)})
+
+
+def _streaks(kind):
+    def streaks(country, start_date, end_date, min_position, max_position, limit):
+        rows = country.data.select(start_date, end_date, min_position, max_position)
+        result = longest_streaks(country.data, rows, kind, limit)
+        return result[['name', 'days', 'start_date', 'end_date', 'missing_days']]
+    return streaks
+
+
+# Métrica -> función(país, desde, hasta, posición mínima, posición máxima, límite) -> DataFrame
+METRICS = {
+    'summary': _summary,
+    'top-tracks': _top_tracks,
+    'top-artists': _top_members('artists'),
+    'top-labels': _top_members('labels'),
+    'number-one-tracks': _number_ones('tracks'),
+    'number-one-artists': _number_ones('artists'),
+    'number-one-labels': _number_ones('labels'),
+    'streams-by-month': _streams_by_month,
+    'streaks-tracks': _streaks('tracks'),
+    'streaks-artists': _streaks('artists'),
+    'streaks-labels': _streaks('labels'),
+}
+
+
+def parse_positions(value):
+    """'1-50' -> (1, 50); '1' -> (1, 1); una tupla o lista de dos enteros se acepta tal cual"""
+    try:
+        if isinstance(value, (tuple, list)):
+            low, high = value
+            return int(low), int(high)
+        low, _, high = str(value).partition('-')
+        return int(low), int(high or low)
+    except (TypeError, ValueError):
+        raise ValueError(f"Rango de posiciones inválido: {value}") from None
+
+
+def parse_date(value):
+    """'AAAA-MM-DD' -> date (None y las fechas se devuelven tal cual)"""
+    if value is None or isinstance(value, date):
+        return value
+    if not isinstance(value, str):
+        raise ValueError(f"Fecha inválida: {value!r} (se espera AAAA-MM-DD)")
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Fecha inválida: {value} (se espera AAAA-MM-DD)") from None
+
+
+def parse_limit(value):
+    """Cantidad de filas de los rankings (entero positivo)"""
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Límite inválido: {value!r}") from None
+    if limit < 1:
+        raise ValueError(f"Límite inválido: {value!r} (debe ser al menos 1)")
+    return limit
+
+
+def to_records(df):
+    """Filas de un resultado como diccionarios serializables a JSON"""
+    df = df.copy()
+    for column in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = df[column].dt.strftime('%Y-%m-%d')
+    return json.loads(df.to_json(orient='records', force_ascii=False))
+
+
+class QueryEngine:
+    """Datos y resultados residentes entre consultas"""
+
+    def __init__(self, store=None, cache=None):
+        self.store = store if store is not None else ChartStore()
+        self.cache = cache if cache is not None else ResultCache()
+
+    def query(self, metric, country, start_date=None, end_date=None, positions=DEFAULT_POSITIONS,
+              limit=DEFAULT_LIMIT):
+        """Resultado de una métrica como DataFrame (las fechas por defecto son las de los datos)"""
+        if not isinstance(metric, str) or metric not in METRICS:
+            raise ValueError(f"Métrica desconocida: {metric} (disponibles: {', '.join(METRICS)})")
+        if not isinstance(country, str) or country not in COUNTRIES:
+            raise ValueError(f"País desconocido: {country}")
+        start_date, end_date = parse_date(start_date), parse_date(end_date)
+        min_position, max_position = parse_positions(positions)
+        limit = parse_limit(limit)
+        country_data = self.store.get(country)
+        if country_data is None:
+            raise ValueError(f"No hay datos para {COUNTRIES[country]}")
+
+        days = country_data.data.index.days
+        if len(days) == 0:
+            raise ValueError(f"No hay datos para {COUNTRIES[country]}")
+        start_date = start_date or days[0].astype('datetime64[D]').item()
+        end_date = end_date or days[-1].astype('datetime64[D]').item()
+
+        key = (country, country_data.version, metric, start_date, end_date, min_position, max_position, limit)
+        return self.cache.get_or_compute(key, lambda: METRICS[metric](
+            country_data, start_date, end_date, min_position, max_position, limit
+        ))
+
+    def batch(self, queries):
+        """Ejecutar una lista de consultas (diccionarios) y devolver sus resultados.
+
+        En cada consulta 'metric' y 'country' pueden ser listas: se ejecutan
+        todas las combinaciones. Una consulta mal formada o con error no corta
+        el resto: su resultado lleva 'error' en lugar de 'result'.
+        """
+        results = []
+        for spec in queries:
+            try:
+                combinations = _combinations(spec)
+            except ValueError as e:
+                results.append({'query': spec, 'error': str(e)})
+                continue
+            for params in combinations:
+                try:
+                    result = self.query(params['metric'], params['country'], params['from'], params['to'],
+                                        params['positions'], params['limit'])
+                    results.append({**params, 'result': to_records(result)})
+                except ValueError as e:
+                    results.append({**params, 'error': str(e)})
+        return results
+
+
+def _combinations(spec):
+    """Parámetros de cada combinación de métricas y países de una consulta de ``batch``"""
+    if not isinstance(spec, dict):
+        raise ValueError("Cada consulta debe ser un objeto con 'metric' y 'country'")
+    values = {}
+    for field in ('metric', 'country'):
+        if field not in spec:
+            raise ValueError(f"Falta '{field}' en la consulta")
+        value = spec[field] if isinstance(spec[field], list) else [spec[field]]
+        if not value:
+            raise ValueError(f"'{field}' no puede ser una lista vacía")
+        values[field] = value
+    return [{'metric': metric, 'country': country, 'from': spec.get('from'), 'to': spec.get('to'),
+             'positions': spec.get('positions', "%d-%d" % DEFAULT_POSITIONS),
+             'limit': spec.get('limit', DEFAULT_LIMIT)}
+            for metric, country in itertools.product(values['metric'], values['country'])]
+
+
+def make_handler(engine):
+    class QueryHandler(BaseHTTPRequestHandler):
+        def _send(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/metrics':
+                return self._send(200, list(METRICS))
+            if url.path != '/query':
+                return self._send(404, {'error': f"Ruta desconocida: {url.path}"})
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            try:
+                result = engine.query(params.get('metric'), params.get('country'), params.get('from'),
+                                      params.get('to'), params.get('positions', "%d-%d" % DEFAULT_POSITIONS),
+                                      params.get('limit', DEFAULT_LIMIT))
+            except ValueError as e:
+                return self._send(400, {'error': str(e)})
+            except Exception as e:
+                return self._send(500, {'error': f"Error interno: {e}"})
+            self._send(200, to_records(result))
+
+        def do_POST(self):
+            if urlparse(self.path).path != '/batch':
+                return self._send(404, {'error': f"Ruta desconocida: {self.path}"})
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                queries = json.loads(self.rfile.read(length))
+            except ValueError as e:
+                return self._send(400, {'error': f"JSON inválido: {e}"})
+            if not isinstance(queries, list) or not all(isinstance(spec, dict) for spec in queries):
+                return self._send(400, {'error': "Se espera una lista de consultas"})
+            try:
+                results = engine.batch(queries)
+            except Exception as e:
+                return self._send(500, {'error': f"Error interno: {e}"})
+            self._send(200, results)
+
+    return QueryHandler
+
+
+def serve(engine, host=HOST, port=PORT):
+    server = ThreadingHTTPServer((host, port), make_handler(engine))
+    print(f"Consultas en http://{host}:{port}/query (Ctrl+C para terminar)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consultas de los charts sin el dashboard")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument("--country", required=True, choices=list(COUNTRIES))
+    filters.add_argument("--from", dest="start_date", help="AAAA-MM-DD (por defecto, la primera fecha)")
+    filters.add_argument("--to", dest="end_date", help="AAAA-MM-DD (por defecto, la última fecha)")
+    filters.add_argument("--positions", default="%d-%d" % DEFAULT_POSITIONS, help="Rango, por ejemplo 1-50")
+    filters.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    filters.add_argument("--json", action="store_true", help="Imprimir el resultado como JSON")
+    for metric in METRICS:
+        subparsers.add_parser(metric, parents=[filters])
+
+    batch_parser = subparsers.add_parser("batch", help="Ejecutar una lista de consultas desde un JSON")
+    batch_parser.add_argument("file", help="Archivo JSON ('-' para leer de la entrada estándar)")
+
+    serve_parser = subparsers.add_parser("serve", help="Servidor HTTP local que responde JSON")
+    serve_parser.add_argument("--host", default=HOST)
+    serve_parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+
+    engine = QueryEngine()
+    if args.command == "serve":
+        serve(engine, args.host, args.port)
+        return
+    if args.command == "batch":
+        started = time.perf_counter()
+        try:
+            if args.file == "-":
+                queries = json.load(sys.stdin)
+            else:
+                with open(args.file, 'r') as f:
+                    queries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"No se pudo leer {args.file}: {e}", file=sys.stderr)
+            sys.exit(1)
+        if not isinstance(queries, list):
+            print(f"{args.file}: se espera una lista de consultas", file=sys.stderr)
+            sys.exit(1)
+        results = engine.batch(queries)
+        json.dump(results, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        failed = sum('error' in result for result in results)
+        print(f"{len(results)} consultas, {failed} con error ({time.perf_counter() - started:.1f}s)",
+              file=sys.stderr)
+        if failed:
+            sys.exit(1)
+        return
+
+    try:
+        result = engine.query(args.command, args.country, args.start_date, args.end_date,
+                              args.positions, args.limit)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    if args.json:
+        print(json.dumps(to_records(result), ensure_ascii=False, indent=2))
+    else:
+        print(result.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Memo LRU de resultados del dashboard, acotado por memoria.
+
+Streamlit vuelve a ejecutar todo ``dashboard.py`` con cada cambio de un
+widget, y con varios usuarios la mayoría de las combinaciones de filtros se
+repiten. Una sola instancia se comparte entre sesiones y guarda las filas
+filtradas y los agregados de cada sección bajo una clave con el país, la
+versión de sus datos y los filtros; al actualizarse el país cambia la versión,
+así que los resultados viejos dejan de pedirse y salen solos por LRU.
+
+Los valores guardados se comparten entre sesiones: no deben modificarse.
+"""
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import fields, is_dataclass
+
+import numpy as np
+import pandas as pd
+
+# Memoria máxima estimada de los resultados guardados
+MAX_CACHE_BYTES = 256 * 1024 ** 2
+
+
+def estimate_bytes(value):
+    """Tamaño aproximado en memoria de un resultado"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_bytes(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_bytes(item) for item in value.values())
+    if is_dataclass(value):
+        return sum(estimate_bytes(getattr(value, field.name)) for field in fields(value))
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """LRU seguro entre hilos que descarta los menos usados al superar ``max_bytes``"""
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()    # clave -> (valor, bytes), del menos al más usado
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """Resultado guardado para ``key`` (None si no está)"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = estimate_bytes(value)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous[1]
+            self.entries[key] = (value, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted
+
+    def get_or_compute(self, key, compute):
+        """Resultado guardado o calculado con ``compute()`` (fuera del lock)"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.total_bytes,
+                    'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,211 @@
+"""Cubos pre-agregados para las métricas y rankings del dashboard.
+
+Para cada país se precalculan apariciones y streams por canción, artista y
+label, agrupados por mes y banda de posiciones. Una consulta por rango de
+fechas y posiciones suma los cubos que quedan completamente dentro del rango y
+solo recorre las filas originales de los bordes (meses o bandas parciales), de
+modo que el resultado es exacto para cualquier combinación de filtros.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from chart_data import POSITION_STRIDE, RowRanges, to_day
+
+# Límites de las bandas de posiciones: [1], [2-3], [4-10], [11-20], [21-50], [51-100], [101-200]
+POSITION_BANDS = np.array([1, 2, 4, 11, 21, 51, 101, 201])
+
+KINDS = ('tracks', 'artists', 'labels')
+
+
+@dataclass
+class Rollup:
+    """Conteos y streams por (mes, banda, id) ordenados por mes"""
+    month: np.ndarray     # int32, meses desde 1970-01
+    band: np.ndarray      # int8, índice de banda de posiciones
+    ids: np.ndarray       # int32, id de la canción, artista o label
+    count: np.ndarray     # int64, apariciones
+    streams: np.ndarray   # int64, suma de streams
+    size: int             # cantidad de ids de la dimensión
+
+
+@dataclass
+class ChartRollups:
+    """Cubos de un país más los streams por fila para resolver los bordes"""
+    streams: np.ndarray     # float64, streams de cada fila
+    tracks: Rollup
+    artists: Rollup
+    labels: Rollup
+
+
+def _entity_links(data, kind):
+    """Filas e ids vinculados de una dimensión (None = una fila por id)"""
+    if kind == 'tracks':
+        return None, data.track_ids, len(data.tracks)
+    bridge = getattr(data, kind)
+    return bridge.row_ids, bridge.ids, len(bridge.names)
+
+
+def _build_rollup(row_ids, ids, size, row_months, row_bands, streams):
+    if row_ids is not None:
+        row_months = row_months[row_ids]
+        row_bands = row_bands[row_ids]
+        streams = streams[row_ids]
+    n_bands = len(POSITION_BANDS) - 1
+    # Posiciones fuera de 1-200 no caen en ninguna banda: quedan fuera del cubo
+    # (ningún filtro del dashboard las incluye)
+    valid = (row_bands >= 0) & (row_bands < n_bands)
+    if not valid.all():
+        row_months, row_bands, streams, ids = row_months[valid], row_bands[valid], streams[valid], ids[valid]
+    # Clave combinada (mes, banda, id) para agrupar en una sola pasada
+    keys = (row_months.astype(np.int64) * n_bands + row_bands) * size + ids
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    count = np.bincount(inverse, minlength=len(unique_keys)).astype(np.int64)
+    stream_sums = np.bincount(inverse, weights=streams, minlength=len(unique_keys)).astype(np.int64)
+    month_band, unique_ids = np.divmod(unique_keys, size)
+    months, bands = np.divmod(month_band, n_bands)
+    return Rollup(
+        month=months.astype(np.int32),
+        band=bands.astype(np.int8),
+        ids=unique_ids.astype(np.int32),
+        count=count,
+        streams=stream_sums,
+        size=size,
+    )
+
+
+def _row_features(df):
+    """Mes, banda de posiciones y streams de cada fila"""
+    row_months = df['date'].to_numpy().astype('datetime64[M]').astype(np.int32)
+    positions = df['Position'].to_numpy()
+    row_bands = (np.searchsorted(POSITION_BANDS, positions, side='right') - 1).astype(np.int8)
+    streams = df['Streams'].fillna(0).to_numpy(dtype=np.float64)
+    return row_months, row_bands, streams
+
+
+def build_rollups(data):
+    """Construir los cubos de canciones, artistas y labels de un país"""
+    row_months, row_bands, streams = _row_features(data.df)
+
+    cubes = {}
+    for kind in KINDS:
+        row_ids, ids, size = _entity_links(data, kind)
+        cubes[kind] = _build_rollup(row_ids, ids, size, row_months, row_bands, streams)
+
+    return ChartRollups(streams=streams, **cubes)
+
+
+def append_rollups(rollups, data, first_row):
+    """Actualizar los cubos después de ``append_chart_data``.
+
+    Solo se recalculan las celdas desde el mes de la primera fila nueva (ese
+    mes puede tener filas anteriores); los meses previos se conservan tal cual.
+    """
+    index = data.index
+    first_day = index.days[index.row_keys[first_row] // POSITION_STRIDE]
+    month_start = np.datetime64(int(first_day), 'D').astype('datetime64[M]')
+    month_row = int(index.offsets[np.searchsorted(index.days, to_day(month_start))])
+    row_months, row_bands, month_streams = _row_features(data.df.iloc[month_row:])
+    streams = np.concatenate([rollups.streams[:month_row], month_streams])
+
+    cubes = {}
+    for kind in KINDS:
+        row_ids, ids, size = _entity_links(data, kind)
+        if row_ids is None:
+            recent = _build_rollup(None, ids[month_row:], size, row_months, row_bands, month_streams)
+        else:
+            lo = np.searchsorted(row_ids, month_row)
+            recent = _build_rollup(row_ids[lo:] - month_row, ids[lo:], size,
+                                   row_months, row_bands, month_streams)
+        cube = getattr(rollups, kind)
+        keep = np.searchsorted(cube.month, row_months[0])
+        cubes[kind] = Rollup(
+            month=np.concatenate([cube.month[:keep], recent.month]),
+            band=np.concatenate([cube.band[:keep], recent.band]),
+            ids=np.concatenate([cube.ids[:keep], recent.ids]),
+            count=np.concatenate([cube.count[:keep], recent.count]),
+            streams=np.concatenate([cube.streams[:keep], recent.streams]),
+            size=size,
+        )
+
+    return ChartRollups(streams=streams, **cubes)
+
+
+def _interior_months(start_day, end_day):
+    """Rango [primer, último] de meses completamente contenidos en las fechas.
+
+    Devuelve también el primer y último día de esos meses.
+    """
+    start = np.datetime64(int(start_day), 'D')
+    end = np.datetime64(int(end_day), 'D')
+    first = start.astype('datetime64[M]')
+    if first.astype('datetime64[D]') != start:
+        first += 1
+    last = (end + 1).astype('datetime64[M]') - 1
+    first_day = first.astype('datetime64[D]').astype(np.int64)
+    last_day = (last + 1).astype('datetime64[D]').astype(np.int64) - 1
+    return int(first.astype(np.int64)), int(last.astype(np.int64)), int(first_day), int(last_day)
+
+
+def _interior_bands(min_position, max_position):
+    """Máscara de las bandas completamente contenidas en las posiciones"""
+    lower = POSITION_BANDS[:-1]
+    upper = POSITION_BANDS[1:] - 1
+    return (lower >= min_position) & (upper <= max_position)
+
+
+def _edge_rows(data, start_day, end_day, min_position, max_position,
+               first_day, last_day, interior_bands):
+    """Filas del rango que no están cubiertas por las celdas del cubo"""
+    index = data.index
+    if first_day > last_day:
+        return index.select(start_day, end_day, min_position, max_position)
+    edges = [
+        index.select(start_day, first_day - 1, min_position, max_position),
+        index.select(last_day + 1, end_day, min_position, max_position),
+    ]
+    if interior_bands.any():
+        bands = np.flatnonzero(interior_bands)
+        band_min = POSITION_BANDS[bands[0]]
+        band_max = POSITION_BANDS[bands[-1] + 1] - 1
+        edges.append(index.select(first_day, last_day, min_position, band_min - 1))
+        edges.append(index.select(first_day, last_day, band_max + 1, max_position))
+    else:
+        edges.append(index.select(first_day, last_day, min_position, max_position))
+    return RowRanges.concat(*edges)
+
+
+def query(data, rollups, kind, start_date, end_date, min_position, max_position):
+    """Apariciones y streams por id para un rango de fechas y posiciones.
+
+    Devuelve dos arreglos (conteos, streams) indexados por id de la dimensión
+    ``kind`` ('tracks', 'artists' o 'labels').
+    """
+    cube = getattr(rollups, kind)
+    start_day, end_day = to_day(start_date), to_day(end_date)
+    first_month, last_month, first_day, last_day = _interior_months(start_day, end_day)
+    interior_bands = _interior_bands(min_position, max_position)
+
+    # Parte pre-agregada: meses y bandas completamente dentro del rango
+    lo, hi = np.searchsorted(cube.month, [first_month, last_month + 1])
+    in_cube = interior_bands[cube.band[lo:hi]]
+    ids = cube.ids[lo:hi][in_cube]
+    counts = np.bincount(ids, weights=cube.count[lo:hi][in_cube], minlength=cube.size).astype(np.int64)
+    streams = np.bincount(ids, weights=cube.streams[lo:hi][in_cube], minlength=cube.size).astype(np.int64)
+
+    # Bordes: filas del rango que no quedaron cubiertas por el cubo
+    edge_rows = _edge_rows(data, start_day, end_day, min_position, max_position,
+                           first_day, last_day, interior_bands)
+
+    row_ids, entity_ids, size = _entity_links(data, kind)
+    if row_ids is None:
+        edge_ids = edge_rows.take(entity_ids)
+        edge_streams = edge_rows.take(rollups.streams)
+    else:
+        links = edge_rows.map(row_ids)
+        edge_ids = links.take(entity_ids)
+        edge_streams = rollups.streams[links.take(row_ids)]
+    counts += np.bincount(edge_ids, minlength=size)
+    streams += np.bincount(edge_ids, weights=edge_streams, minlength=size).astype(np.int64)
+
+    return counts, streams
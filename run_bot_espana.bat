@@ -13,7 +13,7 @@ IF EXIST "venv\Scripts\activate.bat" (
 
 :: Instalar dependencias necesarias
 echo Verificando e instalando dependencias...
-pip install selenium webdriver_manager pandas >nul 2>&1
+pip install selenium webdriver_manager pandas aiohttp >nul 2>&1
 
 echo Iniciando bot de Spotify Charts para España...
 python bot.py es
@@ -0,0 +1,20 @@
+@echo off
+echo Verificando entorno...
+
+:: Verificar si existe el entorno virtual
+IF EXIST "venv\Scripts\activate.bat" (
+    echo Activando entorno virtual...
+    call venv\Scripts\activate.bat
+) ELSE (
+    echo Creando entorno virtual...
+    python -m venv venv
+    call venv\Scripts\activate.bat
+)
+
+:: Instalar dependencias necesarias
+echo Verificando e instalando dependencias...
+pip install selenium webdriver_manager pandas aiohttp >nul 2>&1
+
+echo Iniciando bot de Spotify Charts para todos los países...
+python bot.py ar cl uy mx es --workers 3
+pause 
\ No newline at end of file
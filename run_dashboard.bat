@@ -13,7 +13,7 @@ IF EXIST "venv\Scripts\activate.bat" (
 
 :: Instalar todas las dependencias necesarias
 echo Verificando e instalando dependencias...
-pip install streamlit pandas plotly >nul 2>&1
+pip install streamlit pandas plotly pyarrow >nul 2>&1
 
 echo Iniciando Spotify Charts Dashboard...
 streamlit run dashboard.py
@@ -0,0 +1,196 @@
+"""Almacenamiento columnar de los charts descargados.
+
+El bot deja un CSV por día y país en ``spotify_downloads/<pais>/``. Leer miles
+de archivos pequeños en cada arranque en frío del dashboard es lento, así que
+este módulo los compacta en archivos Parquet particionados por mes dentro de
+``spotify_store/<pais>/``. Cada compactación solo lee las fechas nuevas o
+cuyo CSV cambió, y quita las que dejaron de ser válidas.
+
+Uso:
+    python storage.py            # compactar todos los países
+    python storage.py ar mx      # compactar solo algunos países
+"""
+import json
+import os
+import sys
+
+import pandas as pd
+
+from manifest import DOWNLOADS_DIR, STATUS_OK, get_manifest
+
+COUNTRIES = {
+    'ar': 'Argentina',
+    'cl': 'Chile',
+    'uy': 'Uruguay',
+    'mx': 'México',
+    'es': 'España'
+}
+
+STORE_DIR = "spotify_store"
+
+# Nombres de columnas que usa el dashboard
+COLUMN_MAPPING = {
+    'rank': 'Position',
+    'artist_names': 'Artist',
+    'track_name': 'Track Name',
+    'streams': 'Streams',
+    'source': 'Label'
+}
+
+INDEX_FILE = "_index.json"
+
+
+def read_chart_csv(path, date_str):
+    """Leer un CSV diario y normalizar columnas y tipos"""
+    df = pd.read_csv(path)
+    df = df.rename(columns=COLUMN_MAPPING)
+    df['Position'] = pd.to_numeric(df['Position'], errors='coerce')
+    df['Streams'] = pd.to_numeric(df['Streams'], errors='coerce')
+    df['date'] = pd.Timestamp(date_str)
+    return df
+
+
+def _country_store_dir(country_code, store_dir):
+    return os.path.join(store_dir, country_code)
+
+
+def _load_index(country_dir):
+    """Cargar el índice {mes: {fecha: sha256 del CSV}} de las particiones existentes.
+
+    Un índice anterior, con solo la lista de fechas de cada mes, queda sin
+    huellas: esas fechas se vuelven a leer una vez.
+    """
+    index_path = os.path.join(country_dir, INDEX_FILE)
+    if os.path.exists(index_path):
+        with open(index_path, 'r') as f:
+            index = json.load(f)
+        return {month: dates if isinstance(dates, dict) else dict.fromkeys(dates)
+                for month, dates in index.items()}
+    return {}
+
+
+def _save_index(country_dir, index):
+    index_path = os.path.join(country_dir, INDEX_FILE)
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, index_path)
+
+
+def source_manifest(country_code, downloads_dir=DOWNLOADS_DIR):
+    """Mapear nombre -> mtime (ns) de los CSV válidos de un país.
+
+    Sale del manifiesto validado (``manifest.py``), que solo vuelve a recorrer
+    la carpeta si cambió; sirve para detectar archivos nuevos o reescritos sin
+    abrirlos. Los archivos truncados o inválidos no se cargan.
+    """
+    manifest = get_manifest(country_code, downloads_dir)
+    return {entry['file']: entry['mtime_ns'] for entry in manifest.by_date.values()
+            if entry['status'] == STATUS_OK}
+
+
+def compact_country(country_code, downloads_dir=DOWNLOADS_DIR, store_dir=STORE_DIR):
+    """Poner al día el almacén columnar de un país con sus CSV válidos.
+
+    El índice guarda el sha256 de cada fecha compactada: se leen las fechas
+    nuevas y las cuyo CSV cambió (aunque haya sido con el dashboard detenido),
+    y se quitan las que el manifiesto ya no da por válidas. Solo se reescriben
+    las particiones mensuales afectadas. Devuelve las fechas agregadas,
+    releídas o quitadas.
+    """
+    country_dir = _country_store_dir(country_code, store_dir)
+    os.makedirs(country_dir, exist_ok=True)
+
+    index = _load_index(country_dir)
+    compacted = {date: sha for dates in index.values() for date, sha in dates.items()}
+    manifest = get_manifest(country_code, downloads_dir)
+    for entry in manifest.damaged():
+        print(f"Se omite {entry['file']}: {entry['error']}")
+    csv_files = manifest.valid_files()
+    to_read = [date for date in csv_files if compacted.get(date) != manifest.by_date[date]['sha256']]
+    to_drop = [date for date in compacted if date not in csv_files]
+    if not to_read and not to_drop:
+        return []
+
+    # Agrupar por mes (partición)
+    by_month = {}
+    for date_str in to_read:
+        by_month.setdefault(date_str[:7], ([], []))[0].append(date_str)
+    for date_str in to_drop:
+        by_month.setdefault(date_str[:7], ([], []))[1].append(date_str)
+
+    updated = []
+    for month, (dates, dropped) in sorted(by_month.items()):
+        dfs = []
+        fingerprints = {}
+        for date_str in sorted(dates):
+            try:
+                dfs.append(read_chart_csv(csv_files[date_str], date_str))
+                fingerprints[date_str] = manifest.by_date[date_str]['sha256']
+            except Exception as e:
+                print(f"Error al cargar {csv_files[date_str]}: {str(e)}")
+        if not dfs and not dropped:
+            continue
+
+        partition_path = os.path.join(country_dir, f"{month}.parquet")
+        if os.path.exists(partition_path):
+            existing = pd.read_parquet(partition_path)
+            # Reemplazar las filas de las fechas releídas y quitar las que ya no son válidas
+            replaced = pd.to_datetime(list(fingerprints) + dropped)
+            dfs.insert(0, existing[~existing['date'].isin(replaced)])
+        month_index = {date: sha for date, sha in index.get(month, {}).items() if date not in dropped}
+        month_index.update(fingerprints)
+
+        if not month_index:
+            if os.path.exists(partition_path):
+                os.remove(partition_path)
+            index.pop(month, None)
+        elif dfs:
+            month_df = pd.concat(dfs, ignore_index=True)
+            month_df = month_df.sort_values(['date', 'Position'], kind='stable', ignore_index=True)
+            # Escritura atómica para no dejar particiones a medio escribir
+            tmp_path = partition_path + ".tmp"
+            month_df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, partition_path)
+            index[month] = dict(sorted(month_index.items()))
+        _save_index(country_dir, index)
+        updated.extend(sorted(set(fingerprints) | set(dropped)))
+
+    return sorted(updated)
+
+
+def load_country(country_code, store_dir=STORE_DIR, dates=None):
+    """Leer el almacén columnar de un país (None si está vacío).
+
+    Con ``dates`` solo se leen las particiones de esos meses y se devuelven las
+    filas de esas fechas.
+    """
+    country_dir = _country_store_dir(country_code, store_dir)
+    if not os.path.isdir(country_dir):
+        return None
+    months = None if dates is None else {date[:7] for date in dates}
+    partitions = sorted(
+        os.path.join(country_dir, name)
+        for name in os.listdir(country_dir)
+        if name.endswith('.parquet') and (months is None or name[:7] in months)
+    )
+    if not partitions:
+        return None
+    df = pd.concat([pd.read_parquet(path) for path in partitions], ignore_index=True)
+    if dates is not None:
+        df = df[df['date'].isin(pd.to_datetime(sorted(dates)))].reset_index(drop=True)
+    return df
+
+
+def main():
+    countries = sys.argv[1:] or list(COUNTRIES)
+    for country_code in countries:
+        if country_code not in COUNTRIES:
+            print(f"País desconocido: {country_code}")
+            sys.exit(1)
+        added = compact_country(country_code)
+        print(f"{country_code.upper()}: {len(added)} fechas compactadas o quitadas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Rachas de días consecutivos en el chart por canción, artista o label.
+
+Las rachas se calculan en una sola pasada vectorizada sobre las filas
+seleccionadas: cada aparición se reduce a (clave, día) y al ordenarlas los
+cortes de racha son los cambios de clave o los saltos de día. Los días se
+cuentan sobre las fechas descargadas del país, así que un CSV faltante no
+corta la racha; los días sin datos que quedan dentro de una racha se informan
+en ``missing_days``.
+"""
+import numpy as np
+import pandas as pd
+
+from chart_data import POSITION_STRIDE
+
+KINDS = ('tracks', 'artists', 'labels')
+
+
+def runs(day_ordinals, keys):
+    """Rachas de días consecutivos por clave.
+
+    ``day_ordinals`` es el número de día (entre los días descargados) de cada
+    aparición y ``keys`` la clave de la aparición; una clave puede aparecer
+    varias veces el mismo día. Devuelve (claves, primer día, último día,
+    largo), una posición por racha, ordenadas por clave y día.
+    """
+    if len(keys) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, empty
+    n_days = int(day_ordinals.max()) + 1
+    pairs = np.unique(keys.astype(np.int64) * n_days + day_ordinals)
+    pair_keys, pair_days = np.divmod(pairs, n_days)
+    breaks = np.ones(len(pairs), dtype=bool)
+    breaks[1:] = (pair_keys[1:] != pair_keys[:-1]) | (pair_days[1:] != pair_days[:-1] + 1)
+    starts = np.flatnonzero(breaks)
+    ends = np.append(starts[1:], len(pairs)) - 1
+    return pair_keys[starts], pair_days[starts], pair_days[ends], ends - starts + 1
+
+
+def streaks(data, rows, kind):
+    """Todas las rachas de las filas seleccionadas (``RowRanges``) de un ``ChartData``.
+
+    ``kind`` es 'tracks', 'artists' o 'labels'. Devuelve una fila por racha
+    con el id, primera y última fecha, días en el chart y días sin datos.
+    """
+    if kind == 'tracks':
+        row_ids = rows.indices()
+        keys = data.track_ids[row_ids]
+    else:
+        bridge = data.artists if kind == 'artists' else data.labels
+        links = rows.map(bridge.row_ids)
+        row_ids = links.take(bridge.row_ids)
+        keys = links.take(bridge.ids)
+    ordinals = data.index.row_keys[row_ids] // POSITION_STRIDE
+    ids, first, last, days = runs(ordinals, keys)
+    start_days = data.index.days[first].astype(np.int64)
+    end_days = data.index.days[last].astype(np.int64)
+    return pd.DataFrame({
+        'id': ids,
+        'start_date': start_days.astype('datetime64[D]'),
+        'end_date': end_days.astype('datetime64[D]'),
+        'days': days,
+        'missing_days': end_days - start_days + 1 - days,
+    })
+
+
+def longest_streaks(data, rows, kind, n=10):
+    """La racha más larga de cada clave, para las ``n`` claves con rachas más largas.
+
+    Agrega la columna 'name' (canción y artistas para 'tracks').
+    """
+    all_streaks = streaks(data, rows, kind)
+    best = (all_streaks.sort_values(['days', 'start_date'], ascending=[False, True], kind='stable')
+            .drop_duplicates('id')
+            .head(n)
+            .reset_index(drop=True))
+    ids = best['id'].to_numpy()
+    if kind == 'tracks':
+        tracks = data.tracks
+        names = tracks['Track Name'].take(ids).to_numpy(dtype=object) + " - " + \
+            tracks['Artist'].take(ids).to_numpy(dtype=object)
+    else:
+        names = (data.artists if kind == 'artists' else data.labels).names[ids]
+    return best.assign(name=names)
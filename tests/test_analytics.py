@@ -0,0 +1,52 @@
+"""Recorte de las series de los gráficos de evolución (``capped_long``)"""
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import capped_long  # noqa: E402
+
+
+def gappy_pivot(n_dates=1800, n_series=10, missing=0.3, seed=0):
+    """Pivote fechas x artistas con muchas entradas y salidas del chart"""
+    rng = np.random.default_rng(seed)
+    values = rng.integers(1, 201, (n_dates, n_series)).astype(np.float64)
+    values[rng.random((n_dates, n_series)) < missing] = np.nan
+    return pd.DataFrame(values, index=pd.date_range('2020-01-01', periods=n_dates),
+                        columns=[f"Artista {i}" for i in range(n_series)])
+
+
+class CappedLongTest(unittest.TestCase):
+    def test_gap_markers_count_against_max_points(self):
+        for missing in (0.02, 0.3, 0.9):
+            with self.subTest(missing=missing):
+                pivot = gappy_pivot(missing=missing)
+                result = capped_long(pivot, 'Fecha', 'Artista', 'Posición', max_points=2000)
+                self.assertLessEqual(len(result), 2000)
+                self.assertEqual(set(result['Artista']), set(pivot.columns))
+
+    def test_lines_still_break_where_the_series_left_the_chart(self):
+        pivot = gappy_pivot()
+        result = capped_long(pivot, 'Fecha', 'Artista', 'Posición', max_points=500)
+        self.assertLessEqual(len(result), 500)
+        for key, points in result.groupby('Artista'):
+            original = pivot[key]
+            drawn = points[points['Posición'].notna()]['Fecha'].to_numpy()
+            markers = points[points['Posición'].isna()]['Fecha'].to_numpy()
+            for start, end in zip(drawn[:-1], drawn[1:]):
+                between = original[(original.index > start) & (original.index < end)]
+                has_marker = ((markers > start) & (markers < end)).any()
+                self.assertEqual(has_marker, bool(between.isna().any()))
+
+    def test_small_pivot_is_kept_whole(self):
+        pivot = gappy_pivot(n_dates=30, n_series=3)
+        result = capped_long(pivot, 'Fecha', 'Artista', 'Posición', max_points=2000)
+        self.assertEqual(len(result), pivot.size)
+
+
+if __name__ == "__main__":
+    unittest.main()
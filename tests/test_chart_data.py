@@ -0,0 +1,72 @@
+"""Buscador de la tabla de datos detallados (índice invertido de ``chart_data.py``)"""
+import io
+import os
+import re
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chart_data import Dimensions, append_chart_data, build_chart_data, normalize_text  # noqa: E402
+from charts_stub import fake_chart_csv  # noqa: E402
+from storage import read_chart_csv  # noqa: E402
+
+
+def chart(date, **changes):
+    """Chart de prueba con algunas filas cambiadas (``r<fila>={columna: valor}``), cada una como canción nueva"""
+    df = read_chart_csv(io.BytesIO(fake_chart_csv("ar", date)), date)
+    for row, values in changes.items():
+        df.loc[int(row[1:]), 'uri'] = f"spotify:track:{date}-{row}"
+        for column, value in values.items():
+            df.loc[int(row[1:]), column] = value
+    return df
+
+
+def baseline(df, query):
+    """Filas (en orden fecha, posición) en las que cada palabra empieza alguna palabra de la fila"""
+    df = df.sort_values(['date', 'Position'], kind='stable', ignore_index=True)
+    texts = (df['Track Name'] + " " + df['Artist'] + " " + df['Label']).map(normalize_text)
+    words = [re.findall(r'\w+', text) for text in texts]
+    wanted = re.findall(r'\w+', normalize_text(query))
+    return np.array([row for row, row_words in enumerate(words)
+                     if all(any(word.startswith(part) for word in row_words) for part in wanted)], dtype=np.int64)
+
+
+class SearchTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.df = pd.concat([
+            chart("2024-01-01", r0={'Track Name': "Canción Única", 'Artist': "María Becerra, Bizarrap"}),
+            chart("2024-01-02", r5={'Label': "Sony Music / Dale Play"}),
+        ], ignore_index=True)
+        cls.data = build_chart_data(cls.df)
+        cls.rows = cls.data.select(pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-02"))
+
+    def search(self, query):
+        return self.data.search(self.rows, query).indices()
+
+    def test_matches_word_prefixes_in_any_field(self):
+        for query in ("cancion unica", "MARIA biz", "dale", "sony play", "Artista 1", "label 3 cancion", "zzz"):
+            with self.subTest(query=query):
+                np.testing.assert_array_equal(self.search(query), baseline(self.df, query))
+        self.assertEqual(len(self.search("biz")), 1)
+        self.assertEqual(len(self.search("izarrap")), 0)
+
+    def test_blank_query_keeps_every_row(self):
+        self.assertEqual(len(self.search("  ")), len(self.rows))
+
+    def test_appended_texts_are_searchable(self):
+        dimensions = Dimensions()
+        data = build_chart_data(self.df, dimensions)
+        data.search(self.rows, "cancion")  # arma el índice del snapshot anterior
+        new = chart("2024-01-03", r0={'Track Name': "Tema Nuevo", 'Artist': "Artista Nueva"})
+        data = append_chart_data(data, new, dimensions)
+        rows = data.select(pd.Timestamp("2024-01-03"), pd.Timestamp("2024-01-03"))
+        self.assertEqual(len(data.search(rows, "tema nue")), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
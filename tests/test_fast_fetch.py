@@ -0,0 +1,61 @@
+"""Descarga por HTTP contra el servidor local de ``charts_stub.py``"""
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from charts_stub import CHART_PATH, ChartsHandler  # noqa: E402
+from fast_fetch import fetch_all  # noqa: E402
+
+
+class CountingHandler(ChartsHandler):
+    """Cuenta los pedidos de charts que llegan al servidor"""
+    require_cookie = "sp_dc"
+    chart_requests = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        if CHART_PATH.match(self.path):
+            with self.lock:
+                type(self).chart_requests += 1
+        super().do_GET()
+
+
+class FetchAllTest(unittest.TestCase):
+    def setUp(self):
+        CountingHandler.chart_requests = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), CountingHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.api_url = f"http://127.0.0.1:{self.server.server_port}/charts/{{chart}}/{{date}}"
+        self.base_dir = tempfile.mkdtemp()
+        self.jobs = [("ar", f"2024-01-{day:02d}") for day in range(1, 29)]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def fetch(self, cookies):
+        return asyncio.run(fetch_all(self.jobs, {'cookies': cookies}, self.base_dir, self.api_url,
+                                     concurrency=4, requests_per_second=50))
+
+    def test_downloads_with_valid_session(self):
+        downloaded, pending = self.fetch({'sp_dc': 'x'})
+        self.assertEqual(len(downloaded), len(self.jobs))
+        self.assertEqual(pending, [])
+        self.assertEqual(len(os.listdir(os.path.join(self.base_dir, "ar"))), len(self.jobs))
+
+    def test_stops_requesting_after_401(self):
+        downloaded, pending = self.fetch({})
+        self.assertEqual(downloaded, [])
+        self.assertEqual(sorted(pending), self.jobs)
+        # Solo los pedidos que ya estaban en curso cuando llegó el primer 401
+        self.assertLessEqual(CountingHandler.chart_requests, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+"""Detección de CSV nuevos, reescritos y dañados en el manifiesto"""
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from charts_stub import fake_chart_csv  # noqa: E402
+from manifest import STATUS_OK, STATUS_TRUNCATED, Manifest  # noqa: E402
+
+
+class RefreshTest(unittest.TestCase):
+    def setUp(self):
+        self.csv_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.csv_dir, "regional-ar-daily-2024-01-01.csv")
+        self.content = fake_chart_csv("ar", "2024-01-01")
+        with open(self.path, 'wb') as f:
+            f.write(self.content)
+        self.manifest = Manifest("ar", self.csv_dir)
+        self.manifest.refresh()
+
+    def truncate_in_place(self):
+        mtime_ns = os.stat(self.path).st_mtime_ns
+        with open(self.path, 'wb') as f:
+            f.write(self.content[:len(self.content) // 3])
+        os.utime(self.path, ns=(mtime_ns + 1, mtime_ns + 1))
+
+    def test_rewrites_are_checked_at_most_every_stat_interval(self):
+        self.truncate_in_place()
+        with mock.patch.object(Manifest, '_files_changed', wraps=self.manifest._files_changed) as files_changed:
+            self.manifest.refresh()
+            self.assertEqual(files_changed.call_count, 0)
+            self.assertEqual(self.manifest.status("2024-01-01"), STATUS_OK)
+
+            with mock.patch('manifest.STAT_INTERVAL', 0):
+                self.manifest.refresh()
+            self.assertEqual(files_changed.call_count, 1)
+        self.assertEqual(self.manifest.status("2024-01-01"), STATUS_TRUNCATED)
+
+    def test_recorded_files_do_not_wait_for_the_interval(self):
+        self.truncate_in_place()
+        self.manifest.record(self.path)
+        self.assertEqual(self.manifest.refresh().status("2024-01-01"), STATUS_TRUNCATED)
+
+
+if __name__ == "__main__":
+    unittest.main()
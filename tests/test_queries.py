@@ -0,0 +1,153 @@
+"""Errores de ``queries.py``: consultas mal formadas por Python, línea de comandos y HTTP"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from chart_store import ChartStore  # noqa: E402
+from charts_stub import fake_chart_csv  # noqa: E402
+from manifest import DOWNLOADS_DIR  # noqa: E402
+from queries import QueryEngine, make_handler, parse_date, parse_limit, parse_positions  # noqa: E402
+
+DATES = [f"2024-01-{day:02d}" for day in range(1, 8)]
+
+
+def write_charts(root):
+    """CSV de prueba de Argentina en ``<root>/spotify_downloads/ar``"""
+    csv_dir = os.path.join(root, DOWNLOADS_DIR, "ar")
+    os.makedirs(csv_dir)
+    for date in DATES:
+        with open(os.path.join(csv_dir, f"regional-ar-daily-{date}.csv"), 'wb') as f:
+            f.write(fake_chart_csv("ar", date))
+
+
+class ParseTest(unittest.TestCase):
+    def test_invalid_values_raise_value_error(self):
+        for value in (20240101, ["2024-01-01"], "2024-13-01", "enero"):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                parse_date(value)
+        for value in ("1-x", None, [1], [1, 2, 3], {"min": 1}):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                parse_positions(value)
+        for value in ("diez", None, 0, [10]):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                parse_limit(value)
+        self.assertEqual(parse_positions([1, 50]), (1, 50))
+        self.assertEqual(parse_positions("7"), (7, 7))
+
+
+class EngineTestCase(unittest.TestCase):
+    """Un ``QueryEngine`` sobre los CSV de prueba"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.root = tempfile.mkdtemp()
+        write_charts(cls.root)
+        cls.engine = QueryEngine(ChartStore(os.path.join(cls.root, DOWNLOADS_DIR),
+                                            os.path.join(cls.root, "spotify_store")))
+
+
+class BatchTest(EngineTestCase):
+    def test_malformed_specs_are_reported_per_item(self):
+        results = self.engine.batch([
+            {"country": "ar"},
+            {"metric": "summary", "country": "ar", "from": 20240101},
+            {"metric": {"a": 1}, "country": "ar"},
+            {"metric": "summary", "country": "ar", "limit": "diez"},
+            "summary",
+            {"metric": ["summary", "top-artists"], "country": "ar", "positions": "1-50"},
+        ])
+        self.assertEqual(len(results), 7)
+        self.assertTrue(all('error' in result for result in results[:5]))
+        self.assertIn("metric", results[0]['error'])
+        self.assertIn("Fecha inválida", results[1]['error'])
+        self.assertEqual([result['metric'] for result in results[5:]], ["summary", "top-artists"])
+        self.assertTrue(all('result' in result for result in results[5:]))
+        self.assertEqual(results[5]['result'][0]['rows'], 50 * len(DATES))
+
+
+class EndpointTest(EngineTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(self.engine))
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def request(self, path, body=None):
+        request = urllib.request.Request(self.url + path, data=body)
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, json.load(response)
+        except urllib.error.HTTPError as e:
+            return e.code, json.load(e)
+
+    def test_batch_with_missing_metric_answers_per_item(self):
+        status, results = self.request("/batch", json.dumps([{"country": "ar"}]).encode())
+        self.assertEqual(status, 200)
+        self.assertIn("metric", results[0]['error'])
+
+    def test_malformed_bodies_are_rejected(self):
+        for body in (b"{no es json", b'{"metric": "summary"}', b'[1, 2]', b'\xff\xfe'):
+            with self.subTest(body=body):
+                status, payload = self.request("/batch", body)
+                self.assertEqual(status, 400)
+                self.assertIn('error', payload)
+
+    def test_invalid_query_parameters_are_rejected(self):
+        for query in ("metric=summary&country=ar&from=2024-1-1x", "metric=summary&country=ar&limit=diez",
+                      "metric=summary&country=zz", "country=ar"):
+            with self.subTest(query=query):
+                status, payload = self.request("/query?" + query)
+                self.assertEqual(status, 400)
+                self.assertIn('error', payload)
+        status, rows = self.request("/query?metric=top-artists&country=ar&limit=3")
+        self.assertEqual((status, len(rows)), (200, 3))
+
+
+class CommandLineTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.root = tempfile.mkdtemp()
+        write_charts(cls.root)
+
+    def run_queries(self, *args, stdin=None):
+        return subprocess.run([sys.executable, os.path.join(ROOT, "queries.py"), *args], cwd=self.root,
+                              input=stdin, capture_output=True, text=True, timeout=120)
+
+    def test_invalid_date_exits_with_message(self):
+        result = self.run_queries("summary", "--country", "ar", "--from", "2024-13-01")
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("Fecha inválida", result.stderr)
+        self.assertNotIn("Traceback", result.stderr)
+
+    def test_batch_reports_bad_input_without_traceback(self):
+        for stdin in ("{no es json", '{"metric": "summary"}'):
+            with self.subTest(stdin=stdin):
+                result = self.run_queries("batch", "-", stdin=stdin)
+                self.assertEqual(result.returncode, 1)
+                self.assertNotIn("Traceback", result.stderr)
+
+    def test_batch_keeps_going_after_a_malformed_query(self):
+        queries = [{"country": "ar"}, {"metric": "summary", "country": "ar"}]
+        result = self.run_queries("batch", "-", stdin=json.dumps(queries))
+        self.assertEqual(result.returncode, 1)
+        self.assertNotIn("Traceback", result.stderr)
+        results = json.loads(result.stdout)
+        self.assertIn('error', results[0])
+        self.assertIn('result', results[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+"""Cubos de ``rollups.py`` contra un cálculo directo con pandas sobre charts generados"""
+import io
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chart_data import (ARTIST_SEPARATOR, LABEL_SEPARATOR, Dimensions,  # noqa: E402
+                        append_chart_data, build_chart_data)
+from charts_stub import fake_chart_csv  # noqa: E402
+from rollups import KINDS, append_rollups, build_rollups, query  # noqa: E402
+from storage import read_chart_csv  # noqa: E402
+
+# Rangos que combinan meses completos, meses parciales y bandas parciales
+RANGES = [
+    ('2024-01-20', '2024-04-05', 1, 200),
+    ('2024-02-01', '2024-03-31', 1, 200),
+    ('2024-01-25', '2024-03-07', 3, 57),
+    ('2024-02-10', '2024-02-10', 1, 1),
+    ('2024-02-03', '2024-02-20', 150, 200),
+    ('2024-01-20', '2024-04-05', 11, 100),
+]
+
+
+def generated_charts(start='2024-01-20', end='2024-04-05'):
+    """Charts diarios de prueba (con colaboraciones y varios labels por fila)"""
+    frames = []
+    for date in pd.date_range(start, end).strftime('%Y-%m-%d'):
+        frames.append(read_chart_csv(io.BytesIO(fake_chart_csv("ar", date)), date))
+    return pd.concat(frames, ignore_index=True)
+
+
+def baseline(df, kind, start_date, end_date, min_position, max_position):
+    """{nombre: (apariciones, streams)} con explode y value_counts"""
+    rows = df[(df['date'] >= start_date) & (df['date'] <= end_date)
+              & (df['Position'] >= min_position) & (df['Position'] <= max_position)]
+    if kind == 'tracks':
+        keys = rows['uri']
+    else:
+        column, separator = ('Artist', ARTIST_SEPARATOR) if kind == 'artists' else ('Label', LABEL_SEPARATOR)
+        rows = rows.assign(key=rows[column].str.split(separator)).explode('key')
+        keys = rows['key'].str.strip()
+    counts = keys.value_counts()
+    streams = rows['Streams'].groupby(keys.to_numpy()).sum()
+    return {name: (int(count), int(streams[name])) for name, count in counts.items()}
+
+
+def answer(data, rollups, kind, start_date, end_date, min_position, max_position):
+    """{nombre: (apariciones, streams)} a partir de ``rollups.query``"""
+    counts, streams = query(data, rollups, kind, pd.Timestamp(start_date), pd.Timestamp(end_date),
+                            min_position, max_position)
+    names = data.tracks['uri'].to_numpy() if kind == 'tracks' else getattr(data, kind).names
+    return {names[i]: (int(counts[i]), int(streams[i])) for i in np.flatnonzero(counts)}
+
+
+class RollupQueryTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.df = generated_charts()
+        cls.data = build_chart_data(cls.df)
+        cls.rollups = build_rollups(cls.data)
+
+    def test_matches_explode_and_value_counts(self):
+        for kind in KINDS:
+            for start_date, end_date, min_position, max_position in RANGES:
+                with self.subTest(kind=kind, start=start_date, end=end_date,
+                                  positions=(min_position, max_position)):
+                    self.assertEqual(
+                        answer(self.data, self.rollups, kind, start_date, end_date, min_position, max_position),
+                        baseline(self.df, kind, start_date, end_date, min_position, max_position))
+
+    def test_collaborations_and_label_lists_are_split(self):
+        self.assertTrue(self.df['Artist'].str.contains(ARTIST_SEPARATOR, regex=False).any())
+        self.assertTrue(self.df['Label'].str.contains(LABEL_SEPARATOR, regex=False).any())
+
+
+class AppendTest(unittest.TestCase):
+    def test_append_equals_full_rebuild(self):
+        df = generated_charts()
+        # Corte a mitad de mes: el último mes cargado recibe fechas nuevas
+        cut = pd.Timestamp('2024-03-10')
+        dimensions = Dimensions()
+        data = build_chart_data(df[df['date'] < cut], dimensions)
+        first_row = len(data.df)
+        appended = append_chart_data(data, df[df['date'] >= cut], dimensions)
+        appended_rollups = append_rollups(build_rollups(data), appended, first_row)
+
+        rebuilt = build_chart_data(df, dimensions)
+        rebuilt_rollups = build_rollups(rebuilt)
+
+        pd.testing.assert_frame_equal(appended.df, rebuilt.df)
+        np.testing.assert_array_equal(appended.track_ids, rebuilt.track_ids)
+        for kind in ('artists', 'labels'):
+            for field in ('row_ids', 'ids', 'row_codes'):
+                np.testing.assert_array_equal(getattr(getattr(appended, kind), field),
+                                              getattr(getattr(rebuilt, kind), field))
+        np.testing.assert_array_equal(appended_rollups.streams, rebuilt_rollups.streams)
+        for kind in KINDS:
+            for field in ('month', 'band', 'ids', 'count', 'streams'):
+                np.testing.assert_array_equal(getattr(getattr(appended_rollups, kind), field),
+                                              getattr(getattr(rebuilt_rollups, kind), field))
+            for start_date, end_date, min_position, max_position in RANGES:
+                self.assertEqual(
+                    answer(appended, appended_rollups, kind, start_date, end_date, min_position, max_position),
+                    answer(rebuilt, rebuilt_rollups, kind, start_date, end_date, min_position, max_position))
+
+
+if __name__ == "__main__":
+    unittest.main()
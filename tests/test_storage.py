@@ -0,0 +1,95 @@
+"""Compactación de los CSV y recarga del ``ChartStore`` cuando los CSV cambian"""
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import manifest  # noqa: E402
+from chart_store import ChartStore  # noqa: E402
+from charts_stub import fake_chart_csv  # noqa: E402
+from storage import compact_country, read_chart_csv  # noqa: E402
+
+
+class CompactionTest(unittest.TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.downloads_dir = os.path.join(root, "downloads")
+        self.store_dir = os.path.join(root, "store")
+        os.makedirs(os.path.join(self.downloads_dir, "ar"))
+        self.dates = [f"2024-01-{day:02d}" for day in range(1, 6)] + ["2024-02-01"]
+        for date in self.dates:
+            self.write(date, fake_chart_csv("ar", date))
+
+    def path(self, date):
+        return os.path.join(self.downloads_dir, "ar", f"regional-ar-daily-{date}.csv")
+
+    def write(self, date, content, mtime_ns=None):
+        with open(self.path(date), 'wb') as f:
+            f.write(content)
+        if mtime_ns is not None:
+            os.utime(self.path(date), ns=(mtime_ns, mtime_ns))
+
+    def store(self):
+        return ChartStore(self.downloads_dir, self.store_dir)
+
+    def streams(self, country, date):
+        df = country.data.df
+        return df.loc[df['date'] == date, 'Streams'].sum()
+
+    def test_rewrite_while_stopped_is_reread(self):
+        first = self.store().get("ar")
+        old_mtime = os.stat(self.path("2024-01-03")).st_mtime_ns
+        # Otro contenido para la misma fecha, escrito con el dashboard detenido
+        self.write("2024-01-03", fake_chart_csv("ar", "2023-06-01"), old_mtime + 1_000_000_000)
+
+        # Otro proceso: sin los manifiestos ya leídos
+        with mock.patch.dict(manifest._manifests, clear=True):
+            restarted = self.store().get("ar")
+        expected = read_chart_csv(self.path("2024-01-03"), "2024-01-03")['Streams'].sum()
+        self.assertNotEqual(self.streams(first, "2024-01-03"), expected)
+        self.assertEqual(self.streams(restarted, "2024-01-03"), expected)
+        self.assertEqual(compact_country("ar", self.downloads_dir, self.store_dir), [])
+
+    @mock.patch('manifest.STAT_INTERVAL', 0)
+    def test_date_no_longer_valid_is_dropped(self):
+        store = self.store()
+        before = store.get("ar")
+        # CSV truncado: el manifiesto deja de darlo por válido
+        content = fake_chart_csv("ar", "2024-01-02")
+        self.write("2024-01-02", content[:len(content) // 3], os.stat(self.path("2024-01-02")).st_mtime_ns + 1)
+
+        running = store.get("ar")
+        fresh = ChartStore(self.downloads_dir, self.store_dir).get("ar")
+        self.assertNotEqual(running.version, before.version)
+        self.assertEqual(len(running.data.df), len(fresh.data.df))
+        self.assertEqual(len(running.data.df), len(before.data.df) - 200)
+        self.assertNotIn("2024-01-02", set(running.data.df['date'].dt.strftime('%Y-%m-%d')))
+
+    def test_pinned_countries_are_not_evicted(self):
+        for country_code in ("cl", "mx"):
+            os.makedirs(os.path.join(self.downloads_dir, country_code))
+            with open(os.path.join(self.downloads_dir, country_code,
+                                   f"regional-{country_code}-daily-2024-01-01.csv"), 'wb') as f:
+                f.write(fake_chart_csv(country_code, "2024-01-01"))
+        store = ChartStore(self.downloads_dir, self.store_dir, max_countries=1)
+        with store.pinned(["ar", "cl", "mx"]):
+            loaded = {code: store.get(code) for code in ("ar", "cl", "mx")}
+            self.assertEqual(store.loaded(), ["ar", "cl", "mx"])
+            # Sin volver a cargar: los datos siguen siendo los mismos objetos
+            self.assertTrue(all(store.get(code) is country for code, country in loaded.items()))
+        self.assertEqual(store.loaded(), ["mx"])
+        store.get("ar")
+        self.assertEqual(store.loaded(), ["ar"])
+
+    def test_dropping_every_date_of_a_month_removes_its_partition(self):
+        compact_country("ar", self.downloads_dir, self.store_dir)
+        os.remove(self.path("2024-02-01"))
+        self.assertEqual(compact_country("ar", self.downloads_dir, self.store_dir), ["2024-02-01"])
+        self.assertFalse(os.path.exists(os.path.join(self.store_dir, "ar", "2024-02.parquet")))
+
+
+if __name__ == "__main__":
+    unittest.main()